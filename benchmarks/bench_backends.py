@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Compares latency and throughput of the summary backends.
+
+Usage:
+    python benchmarks/bench_backends.py --backend extractive
+    python benchmarks/bench_backends.py --backend compatible \\
+        --base-url http://localhost:8080/v1 --model llama-3.1-8b-instruct
+    python benchmarks/bench_backends.py --backend openai --refs 1500 1501
+"""
+
+import argparse
+
+from harness import measure, report
+
+from backends import create_backend
+from referendum import get_referendum
+
+# Used when no referenda are requested, so the benchmark can run offline
+SAMPLE_CONTENT = (
+    "This proposal requests 50,000 DOT from the treasury to fund a six month programme of "
+    "developer tooling. The funds cover two full time engineers, infrastructure and an "
+    "external audit. Milestones are reported monthly on the forum. The team previously "
+    "delivered the indexer used by several parachains. Some community members have asked "
+    "whether the audit budget is sufficient and whether the tooling duplicates existing "
+    "work. The proposers argue the new tooling targets a different audience and will be "
+    "maintained for at least two years after delivery."
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backend", action="append", choices=["openai", "compatible", "extractive"]
+    )
+    parser.add_argument("--base-url")
+    parser.add_argument("--model")
+    parser.add_argument("--api-key")
+    parser.add_argument("--refs", nargs="*", type=int, default=[])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.refs:
+        contents = [get_referendum(ref).get("content") or "" for ref in args.refs]
+    else:
+        contents = [SAMPLE_CONTENT]
+
+    for kind in args.backend or ["extractive"]:
+        backend = create_backend(kind, args.base_url, args.model, args.api_key)
+        report(kind, measure(backend.summarise, contents, repeats=args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compares decode time and peak memory of response.json() against decode_referendum.
+
+Usage:
+    python benchmarks/bench_decode.py                 # synthetic payload with many comments
+    python benchmarks/bench_decode.py --refs 1500 1501 # real PolkAssembly payloads
+"""
+
+import argparse
+import json
+import tracemalloc
+
+import httpx
+from harness import measure, report
+
+from referendum import POLKASSEMBLY_BASE_URL, decode_referendum
+
+
+def synthetic_payload(comments: int) -> bytes:
+    """Builds an on-chain post shaped payload with a large comment thread."""
+    comment = {
+        "id": "c",
+        "content": "I support this proposal, but the milestones need more detail. " * 5,
+        "username": "voter",
+        "comment_reactions": {"👍": {"count": 4, "usernames": ["a", "b", "c", "d"]}},
+        "replies": [{"content": "Agreed.", "username": "other"}] * 3,
+    }
+    post = {
+        "title": "Treasury Proposal",
+        "status": "Deciding",
+        "content": "Proposal body. " * 2000,
+        "tags": ["treasury"],
+        "comments_count": comments,
+        "comments": [comment] * comments,
+        "timeline": [{"status": "Submitted", "block": i} for i in range(50)],
+        "post_reactions": {"👍": {"count": 120, "usernames": ["voter"] * 120}},
+    }
+    return json.dumps(post).encode()
+
+
+def fetch_payloads(refs: list) -> list:
+    params = {"proposalType": "referendums_v2"}
+    headers = {"x-network": "polkadot"}
+    with httpx.Client(base_url=POLKASSEMBLY_BASE_URL, timeout=None) as client:
+        return [
+            client.get("/posts/on-chain-post", params={**params, "postId": ref}, headers=headers)
+            .raise_for_status()
+            .content
+            for ref in refs
+        ]
+
+
+def peak_memory_kib(fn, payloads: list) -> float:
+    """Returns the peak traced allocation while decoding every payload once."""
+    tracemalloc.start()
+    for payload in payloads:
+        fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--refs", nargs="*", type=int, default=[])
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = fetch_payloads(args.refs) if args.refs else [synthetic_payload(args.comments)]
+    print(f"payloads={len(payloads)} bytes={sum(len(p) for p in payloads)}")
+
+    candidates = {
+        "response.json()": lambda payload: httpx.Response(200, content=payload).json(),
+        "decode_referendum": decode_referendum,
+    }
+    for name, fn in candidates.items():
+        report(name, measure(fn, payloads, repeats=args.repeats))
+        print(f"{'':<24} peak_memory={peak_memory_kib(fn, payloads):.0f}KiB")
+
+
+if __name__ == "__main__":
+    main()
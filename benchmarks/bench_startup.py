@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Measures startup-to-first-render latency of the interactive referendum command.
+
+The first render is the first metadata line printed. A cold start has no snapshot, so
+the metadata is only shown once Display Referendum Metadata is chosen and the referendum
+fetched; a warm start renders from a snapshot saved beforehand while the fetch happens in
+the background. Both are timed the same way, from launch until the title line appears,
+with the CLI running on a pseudo-terminal and the menu answered as soon as it shows.
+
+Usage:
+    python benchmarks/bench_startup.py --ref 1500
+"""
+
+import argparse
+import os
+import pty
+import select
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from harness import measure, report
+
+from referendum import get_referendum
+from snapshot import Snapshot
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+# Seconds to wait for any output before a run counts as failed
+READ_TIMEOUT = 60
+
+
+def time_to_render(ref: int, snapshot_path: str):
+    """Runs the CLI until it prints the referendum title, picking the first menu choice.
+
+    Returns nothing; callers time it with the harness.
+    """
+    # The menu needs a terminal; its first choice is Display Referendum Metadata
+    master, slave = pty.openpty()
+    env = {**os.environ, "SNAPSHOT_PATH": snapshot_path, "CACHE_BACKEND": "memory"}
+    process = subprocess.Popen(
+        [sys.executable, str(MAIN), "referendum", "--ref", str(ref)],
+        stdin=slave,
+        stdout=slave,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    os.close(slave)
+    output = b""
+    answered = False
+    try:
+        while b"Title:" not in output:
+            ready, _, _ = select.select([master], [], [], READ_TIMEOUT)
+            if not ready:
+                raise RuntimeError("CLI produced no output")
+            chunk = os.read(master, 4096)
+            output += chunk
+            # Answer the menu's cursor position query as a terminal would
+            if b"\x1b[6n" in chunk:
+                os.write(master, b"\x1b[1;1R")
+            # Press Enter once the menu has been drawn and shows the cursor again
+            menu = output.find(b"Choose an action")
+            if not answered and menu >= 0 and b"\x1b[?25h" in output[menu:]:
+                os.write(master, b"\r")
+                answered = True
+    finally:
+        process.kill()
+        process.wait()
+        os.close(master)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ref", type=int, required=True)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "snapshot.bin")
+
+        def cold(ref: int):
+            # Every cold run saves a snapshot, so remove it to keep the next one cold
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            time_to_render(ref, snapshot_path)
+
+        report("cold first render", measure(cold, [args.ref], args.repeats))
+
+        Snapshot(snapshot_path).update(args.ref, referendum=get_referendum(args.ref))
+        warm = measure(lambda ref: time_to_render(ref, snapshot_path), [args.ref], args.repeats)
+        report("warm first render", warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Shared benchmark harness for the OpenGov Summary CLI.
+
+Every benchmark times a callable over the same inputs and reports latency percentiles
+and throughput in the same format, so numbers from different backends and code paths
+can be compared side by side.
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+# Benchmarks run as plain scripts, so make the application modules importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def measure(fn: Callable[[Any], Any], inputs: Iterable[Any], repeats: int = 1) -> dict:
+    """Calls fn once per input, repeats times, and returns latency and throughput stats."""
+    items = list(inputs)
+    latencies = []
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            call_started = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "total_s": elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def report(name: str, stats: dict):
+    """Prints one line of benchmark results."""
+    print(
+        f"{name:<24} calls={stats['calls']:<6} mean={stats['mean_ms']:9.2f}ms "
+        f"p50={stats['p50_ms']:9.2f}ms p95={stats['p95_ms']:9.2f}ms "
+        f"throughput={stats['throughput_per_s']:9.2f}/s"
+    )
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
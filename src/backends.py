@@ -0,0 +1,246 @@
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+# Default model used when talking to OpenAI directly
+DEFAULT_OPENAI_MODEL = "gpt-4.1"
+
+# Environment variables used to select and configure the summary backend
+BACKEND_ENV = "SUMMARY_BACKEND"
+BASE_URL_ENV = "SUMMARY_BASE_URL"
+MODEL_ENV = "SUMMARY_MODEL"
+API_KEY_ENV = "SUMMARY_API_KEY"
+
+# Instructions shared by every model-backed summariser
+SYSTEM_PROMPT = (
+    "You are a neutral Polkadot governance analyst.\n"
+    "Summarise the referendum in 150-200 words.\n"
+    "• Purpose\n• Funding/mechanics\n"
+    "• Potential impact\n• Controversial points (if any)\n\n"
+    "The output of this summary is for the command line, so it is "
+    "imperative that plain text is output - not markdown, not HTML, etc. "
+    "Just plain text."
+)
+
+# Words ignored when scoring sentences for the extractive summariser
+STOPWORDS = frozenset(
+    """
+    a about above after again all also am an and any are as at be because been before being
+    below between both but by can could did do does doing down during each few for from
+    further had has have having he her here hers him his how i if in into is it its itself
+    just me more most my no nor not now of off on once only or other our ours out over own
+    same she should so some such than that the their theirs them then there these they this
+    those through to too under until up very was we were what when where which while who
+    whom why will with would you your yours
+    """.split()
+)
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+# Tags that end a line of text; list items and paragraphs often carry no punctuation
+_BLOCK_TAG = re.compile(r"<(?:br|/?p|/?li|/?div|/?h[1-6]|/?tr)\b[^>]*>", re.IGNORECASE)
+_LIST_MARKER = re.compile(r"^\s*(?:[-+*\u2022]|\d+[.)])\s+")
+_MARKUP = re.compile(r"<[^>]+>|!\[[^\]]*\]\([^)]*\)|[#*_`>|]+")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_WORD = re.compile(r"[a-z0-9']+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Token usage of the last model call made on each thread, as reported by the server
+_usage = threading.local()
+
+
+class SummaryBackend(ABC):
+    """Base class for anything that can turn referendum content into a summary"""
+
+    name = "base"
+    model: Optional[str] = None
+
+    @abstractmethod
+    def summarise(self, content: str) -> Optional[str]:
+        """Returns a plain text summary of content"""
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the backend and model in cache keys, so their summaries never mix"""
+        return f"{self.name}/{self.model}" if self.model else self.name
+
+
+class OpenAIBackend(SummaryBackend):
+    """Summarises content with the hosted OpenAI Responses API"""
+
+    name = "openai"
+
+    def __init__(self, model: str = DEFAULT_OPENAI_MODEL):
+        self.model = model
+
+    def summarise(self, content: str) -> Optional[str]:
+        # Imported on first use, the SDK takes longer to import than the CLI takes to start
+        import openai
+
+        response = openai.responses.create(
+            model=self.model,
+            input=[
+                {
+                    "role": "system",
+                    "content": [{"type": "input_text", "text": SYSTEM_PROMPT}],
+                },
+                {"role": "user", "content": content},
+            ],
+            text={"format": {"type": "text"}},
+            reasoning={},
+            tools=[],
+            temperature=1,
+            max_output_tokens=2048,
+            top_p=1,
+            store=True,
+        )
+
+        record_usage(response)
+        return response.output_text
+
+
+class CompatibleBackend(SummaryBackend):
+    """Summarises content with any OpenAI-compatible server, e.g. llama.cpp or vLLM
+
+    Local servers generally implement Chat Completions rather than the Responses API, so
+    this backend speaks the former.
+    """
+
+    name = "compatible"
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None):
+        import openai
+
+        self.base_url = base_url
+        self.model = model
+        # Local servers usually ignore the key, but the client insists on having one
+        self.client = openai.OpenAI(base_url=base_url, api_key=api_key or "not-needed")
+
+    def summarise(self, content: str) -> Optional[str]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": content},
+            ],
+            temperature=1,
+            max_tokens=2048,
+            top_p=1,
+        )
+
+        record_usage(response)
+        return response.choices[0].message.content
+
+
+class ExtractiveBackend(SummaryBackend):
+    """Deterministic summariser that picks the most representative sentences of the content"""
+
+    name = "extractive"
+
+    def __init__(self, max_words: int = 200):
+        self.max_words = max_words
+
+    def summarise(self, content: str) -> Optional[str]:
+        return extractive_summary(content, max_words=self.max_words)
+
+
+def record_usage(response):
+    """Notes the total tokens a model response reports using, for the current thread"""
+    tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+    _usage.tokens = tokens if isinstance(tokens, int) else None
+
+
+def take_usage() -> Optional[int]:
+    """Returns and clears the token usage recorded on the current thread, if any"""
+    tokens = getattr(_usage, "tokens", None)
+    _usage.tokens = None
+    return tokens
+
+
+def clean_text(content: str) -> str:
+    """Strips markdown and HTML markup from content, leaving plain text"""
+    text = _LINK.sub(r"\1", content)
+    text = _MARKUP.sub(" ", text)
+    return text
+
+
+def extractive_summary(content: str, max_words: int = 200) -> str:
+    """Returns the highest scoring sentences of content, in their original order"""
+    sentences = []
+    # Every line is split on its own, so bullet points never run together into one sentence
+    for line in _BLOCK_TAG.sub("\n", content).split("\n"):
+        line = clean_text(_LIST_MARKER.sub("", line))
+        for chunk in _SENTENCE_SPLIT.split(line):
+            sentence = _WHITESPACE.sub(" ", chunk).strip()
+            if sentence:
+                sentences.append(sentence)
+
+    if not sentences:
+        return ""
+
+    frequencies = Counter(
+        word
+        for sentence in sentences
+        for word in _WORD.findall(sentence.lower())
+        if word not in STOPWORDS
+    )
+    top = max(frequencies.values(), default=1)
+
+    def score(sentence: str) -> float:
+        words = [w for w in _WORD.findall(sentence.lower()) if w not in STOPWORDS]
+        if not words:
+            return 0.0
+        return sum(frequencies[w] for w in words) / (top * len(words) ** 0.5)
+
+    # Rank by score, ties broken by position so the output is stable
+    ranked = sorted(range(len(sentences)), key=lambda i: (-score(sentences[i]), i))
+
+    chosen = {}
+    word_count = 0
+    for index in ranked:
+        words = sentences[index].split()
+        if word_count + len(words) > max_words:
+            if chosen:
+                continue
+            # The best sentence alone is too long, e.g. a paragraph without punctuation
+            words = words[:max_words]
+        chosen[index] = " ".join(words)
+        word_count += len(words)
+        if word_count >= max_words:
+            break
+
+    return " ".join(chosen[i] for i in sorted(chosen))
+
+
+@lru_cache(maxsize=None)
+def create_backend(
+    kind: str = "openai",
+    base_url: Optional[str] = None,
+    model: Optional[str] = None,
+    api_key: Optional[str] = None,
+) -> SummaryBackend:
+    """Builds a summary backend by name"""
+    if kind == "openai":
+        return OpenAIBackend(model or DEFAULT_OPENAI_MODEL)
+    if kind == "compatible":
+        if not base_url:
+            raise ValueError(f"{BASE_URL_ENV} must be set for the compatible backend")
+        if not model:
+            raise ValueError(f"{MODEL_ENV} must be set for the compatible backend")
+        return CompatibleBackend(base_url, model, api_key)
+    if kind == "extractive":
+        return ExtractiveBackend()
+    raise ValueError(f"Unknown summary backend: {kind}")
+
+
+def get_backend() -> SummaryBackend:
+    """Returns the summary backend selected by the environment (OpenAI by default)"""
+    return create_backend(
+        os.environ.get(BACKEND_ENV, "openai").strip().lower(),
+        os.environ.get(BASE_URL_ENV) or None,
+        os.environ.get(MODEL_ENV) or None,
+        os.environ.get(API_KEY_ENV) or None,
+    )
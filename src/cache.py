@@ -0,0 +1,431 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from backends import get_backend
+
+# Environment variables used to select and configure the cache backend
+CACHE_BACKEND_ENV = "CACHE_BACKEND"
+CACHE_PATH_ENV = "CACHE_PATH"
+CACHE_URL_ENV = "CACHE_URL"
+
+DEFAULT_CACHE_PATH = ".opengov-cache.sqlite3"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+# Referendum metadata changes as votes come in, so it is only reused briefly. Summaries
+# are keyed by a hash of their input and never go stale.
+REFERENDUM_TTL = 300
+SUMMARY_LOCK_TTL = 300
+SUMMARY_LOCK_TIMEOUT = 300
+LOCK_POLL_INTERVAL = 0.2
+
+
+class LockTimeout(Exception):
+    """Raised when a cache lock could not be acquired in time"""
+
+
+class CacheBackend(ABC):
+    """Key/value store for JSON-serialisable values with expiring locks"""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Returns the value stored under key, or None if it is missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Stores value under key, expiring after ttl seconds when given"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Removes key if it exists"""
+
+    @abstractmethod
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        """Takes the named lock if it is free and returns its token, otherwise None"""
+
+    @abstractmethod
+    def release_lock(self, name: str, token: str):
+        """Releases the named lock if it is still held with this token"""
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Adds amount to the integer stored under key and returns the new value
+
+        This default holds a lock around a read and a write; backends override it with an
+        atomic operation where they have one.
+        """
+        with self.lock(f"incr:{key}"):
+            value = int(self.get(key) or 0) + amount
+            self.set(key, str(value), ttl)
+        return value
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key: str, value, ttl: Optional[float] = None):
+        self.set(key, json.dumps(value, ensure_ascii=False), ttl)
+
+    @contextmanager
+    def lock(
+        self,
+        name: str,
+        ttl: float = SUMMARY_LOCK_TTL,
+        timeout: float = SUMMARY_LOCK_TIMEOUT,
+        poll: float = LOCK_POLL_INTERVAL,
+    ):
+        """Holds the named lock for the duration of the block, waiting up to timeout for it"""
+        deadline = time.monotonic() + timeout
+        token = self.acquire_lock(name, ttl)
+        while token is None:
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Timed out waiting for lock {name}")
+            time.sleep(poll)
+            token = self.acquire_lock(name, ttl)
+        try:
+            yield token
+        finally:
+            self.release_lock(name, token)
+
+
+class MemoryCache(CacheBackend):
+    """Cache private to the current process"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._mutex:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._mutex:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str):
+        with self._mutex:
+            self._values.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._mutex:
+            entry = self._values.get(key)
+            current = 0
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                current = int(entry[0])
+            value = current + amount
+            self._values[key] = (str(value), time.time() + ttl if ttl else None)
+        return value
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        with self._mutex:
+            held = self._locks.get(name)
+            if held is not None and held[1] > time.time():
+                return None
+            token = uuid.uuid4().hex
+            self._locks[name] = (token, time.time() + ttl)
+            return token
+
+    def release_lock(self, name: str, token: str):
+        with self._mutex:
+            if self._locks.get(name, (None,))[0] == token:
+                del self._locks[name]
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a SQLite file in WAL mode, shared by every process on the host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._mutex = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT, expires_at REAL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._mutex:
+            row = self._connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._mutex:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else None),
+            )
+
+    def delete(self, key: str):
+        with self._mutex:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        with self._mutex:
+            # The upsert and the read back share one write transaction, so no other
+            # process can add in between; an expired value counts as zero
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = CASE "
+                    "WHEN cache.expires_at IS NOT NULL AND cache.expires_at <= ? "
+                    "THEN excluded.value ELSE CAST(cache.value AS INTEGER) + excluded.value END, "
+                    "expires_at = excluded.expires_at",
+                    (key, amount, now + ttl if ttl else None, now),
+                )
+                row = self._connection.execute(
+                    "SELECT value FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return int(row[0])
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._mutex:
+            # The upsert only replaces a lock that has expired, and runs as a single
+            # write transaction, so two processes can never both take the same lock
+            self._connection.execute(
+                "INSERT INTO locks (name, token, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET token = excluded.token, "
+                "expires_at = excluded.expires_at WHERE locks.expires_at <= ?",
+                (name, token, now + ttl, now),
+            )
+            row = self._connection.execute(
+                "SELECT token FROM locks WHERE name = ?", (name,)
+            ).fetchone()
+        return token if row and row[0] == token else None
+
+    def release_lock(self, name: str, token: str):
+        with self._mutex:
+            self._connection.execute(
+                "DELETE FROM locks WHERE name = ? AND token = ?", (name, token)
+            )
+
+
+class RedisCache(CacheBackend):
+    """Cache on any server speaking the Redis protocol (Redis, Valkey, KeyDB, ...)
+
+    Talks RESP directly over a socket, so no client library is required.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, timeout: float = 5):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.url = url
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._mutex = threading.Lock()
+        self._socket = None
+        self._reader = None
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.command("GET", key)
+        return None if value is None else value.decode("utf-8")
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        if ttl:
+            self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key: str):
+        self.command("DEL", key)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self.command("INCRBY", key, amount)
+        if ttl:
+            self.command("PEXPIRE", key, int(ttl * 1000))
+        return value
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        reply = self.command("SET", f"lock:{name}", token, "NX", "PX", int(ttl * 1000))
+        return token if reply == "OK" else None
+
+    def release_lock(self, name: str, token: str):
+        # Check-and-delete is not atomic, but the lock TTL bounds the window in which a
+        # newer holder could lose its lock to a late release
+        key = f"lock:{name}"
+        if self.command("GET", key) == token.encode():
+            self.command("DEL", key)
+
+    def command(self, *args):
+        """Sends one command and returns its decoded reply"""
+        with self._mutex:
+            try:
+                if self._socket is None:
+                    self._connect()
+                return self._send(args)
+            except OSError:
+                self.close()
+                raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
+        self._reader = None
+
+    def _connect(self):
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._socket.makefile("rb")
+        if self.password:
+            self._send(("AUTH", self.password))
+        if self.db:
+            self._send(("SELECT", self.db))
+
+    def _send(self, args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._socket.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Cache server error: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"Unexpected reply from cache server: {line!r}")
+
+
+@lru_cache(maxsize=None)
+def create_cache(kind: str = "memory", location: Optional[str] = None) -> CacheBackend:
+    """Builds a cache backend by name"""
+    if kind == "memory":
+        return MemoryCache()
+    if kind == "sqlite":
+        return SQLiteCache(location or DEFAULT_CACHE_PATH)
+    if kind == "redis":
+        return RedisCache(location or DEFAULT_REDIS_URL)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+def get_cache() -> CacheBackend:
+    """Returns the cache backend selected by the environment (in-memory by default)"""
+    kind = os.environ.get(CACHE_BACKEND_ENV, "memory").strip().lower()
+    location = os.environ.get(CACHE_URL_ENV if kind == "redis" else CACHE_PATH_ENV) or None
+    return create_cache(kind, location)
+
+
+def summary_key(ref_id: int, content: str, source: str) -> str:
+    """Cache key of a summary, which changes whenever the summary input or source does
+
+    source is the cache_id of the backend that wrote the summary, so summaries from
+    different backends and models sharing a cache never stand in for each other.
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    return f"summary:{source}:{ref_id}:{digest}"
+
+
+def referendum_key(ref_id: int) -> str:
+    """Cache key of a referendum's data"""
+    return f"referendum:{ref_id}"
+
+
+def latest_summary_key(ref_id: int, source: str) -> str:
+    """Cache key of the most recent summary of a referendum from source, whatever its input was"""
+    return f"summary-latest:{source}:{ref_id}"
+
+
+def cached_referendum(
+    ref_id: int, fetch: Callable[[int], dict], cache: Optional[CacheBackend] = None
+) -> dict:
+    """Returns referendum data from the cache, fetching and storing it on a miss"""
+    cache = cache or get_cache()
+    key = referendum_key(ref_id)
+    result = cache.get_json(key)
+    if result is None:
+        result = fetch(ref_id)
+        cache.set_json(key, result, REFERENDUM_TTL)
+    return result
+
+
+def cached_summary(
+    ref_id: int,
+    content: str,
+    summarise: Callable[[str], Optional[str]],
+    cache: Optional[CacheBackend] = None,
+    source: Optional[str] = None,
+) -> Optional[str]:
+    """Returns the summary of content, generating it in at most one worker at a time
+
+    Other workers asking for the same summary wait on the lock and then read the result
+    from the cache instead of generating it again. source is the cache_id of the backend
+    summarise calls, the environment's backend by default.
+    """
+    cache = cache or get_cache()
+    source = source or get_backend().cache_id
+    key = summary_key(ref_id, content, source)
+    summary = cache.get_json(key)
+    if summary is not None:
+        return summary
+
+    with cache.lock(f"summary:{source}:{ref_id}"):
+        summary = cache.get_json(key)
+        if summary is None:
+            summary = summarise(content)
+            if summary is not None:
+                cache.set_json(key, summary)
+                cache.set_json(latest_summary_key(ref_id, source), summary)
+    return summary
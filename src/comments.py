@@ -0,0 +1,186 @@
+import heapq
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import httpx
+
+from backends import clean_text
+from cache import CacheBackend, get_cache
+from referendum import POLKASSEMBLY_BASE_URL, REQUEST_TIMEOUT
+
+# Comments requested per page, and how many pages may be in flight at once
+COMMENTS_PAGE_SIZE = 50
+COMMENTS_PREFETCH = 4
+
+# How many of the most reacted comments are quoted in the digest, and how much of each
+DIGEST_TOP_COMMENTS = 5
+DIGEST_SNIPPET_CHARS = 280
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CommentDigest:
+    """Compact running summary of a referendum's discussion
+
+    Comments are folded in one at a time and then discarded, so the digest stays the same
+    size however long the thread gets. It also records how many comments it has seen, which
+    lets later fetches resume where the previous one stopped.
+    """
+
+    def __init__(self, ref_id: int):
+        self.ref_id = ref_id
+        self.seen = 0
+        self.replies = 0
+        self.participants = set()
+        self.reactions = {}
+        self.top_comments = []
+
+    def add(self, comment: dict):
+        """Folds a single comment into the digest"""
+        self.seen += 1
+        self.replies += len(comment.get("replies") or [])
+        if comment.get("username"):
+            self.participants.add(comment["username"])
+
+        score = 0
+        for reaction, details in (comment.get("comment_reactions") or {}).items():
+            count = details.get("count", 0) if isinstance(details, dict) else 0
+            self.reactions[reaction] = self.reactions.get(reaction, 0) + count
+            score += count
+
+        text = _WHITESPACE.sub(" ", clean_text(comment.get("content") or "")).strip()
+        if text:
+            # Keep only the most reacted comments; earlier comments win ties
+            entry = (score, -self.seen, text[:DIGEST_SNIPPET_CHARS])
+            if len(self.top_comments) < DIGEST_TOP_COMMENTS:
+                heapq.heappush(self.top_comments, entry)
+            else:
+                heapq.heappushpop(self.top_comments, entry)
+
+    def render(self) -> str:
+        """Returns the digest as plain text suitable for the summary prompt"""
+        lines = [
+            f"Comments: {self.seen} from {len(self.participants)} participants, "
+            f"{self.replies} replies."
+        ]
+        if self.reactions:
+            reactions = ", ".join(f"{name} {count}" for name, count in self.reactions.items())
+            lines.append(f"Reactions on comments: {reactions}.")
+        if self.top_comments:
+            lines.append("Most reacted comments:")
+            for score, _, text in sorted(self.top_comments, reverse=True):
+                lines.append(f"- ({score} reactions) {text}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "ref_id": self.ref_id,
+            "seen": self.seen,
+            "replies": self.replies,
+            "participants": sorted(self.participants),
+            "reactions": self.reactions,
+            "top_comments": [list(entry) for entry in self.top_comments],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CommentDigest":
+        digest = cls(data["ref_id"])
+        digest.seen = data["seen"]
+        digest.replies = data["replies"]
+        digest.participants = set(data["participants"])
+        digest.reactions = dict(data["reactions"])
+        digest.top_comments = [tuple(entry) for entry in data["top_comments"]]
+        heapq.heapify(digest.top_comments)
+        return digest
+
+
+def get_comments_page(client: httpx.Client, ref_id: int, page: int, page_size: int) -> list:
+    """Fetches one page of comments, oldest first"""
+    params = {
+        "postId": ref_id,
+        "postType": "referendums_v2",
+        "page": page,
+        "listingLimit": page_size,
+        "sortBy": "oldest",
+    }
+    headers = {"x-network": "polkadot"}
+
+    response = client.get("/posts/comments", params=params, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    if isinstance(data, dict):
+        return data.get("comments") or []
+    return data
+
+
+def iter_comments(
+    ref_id: int,
+    start: int = 0,
+    page_size: int = COMMENTS_PAGE_SIZE,
+    prefetch: int = COMMENTS_PREFETCH,
+) -> Iterator[dict]:
+    """Streams the comments of a referendum, oldest first, skipping the first `start`
+
+    Up to `prefetch` pages are requested concurrently ahead of the consumer, so at most
+    that many pages are held in memory at any time.
+    """
+    first_page = start // page_size + 1
+    skip = start % page_size
+
+    with httpx.Client(base_url=POLKASSEMBLY_BASE_URL, timeout=REQUEST_TIMEOUT) as client:
+        pool = ThreadPoolExecutor(max_workers=prefetch)
+        try:
+            pending = deque(
+                pool.submit(get_comments_page, client, ref_id, page, page_size)
+                for page in range(first_page, first_page + prefetch)
+            )
+            next_page = first_page + prefetch
+
+            while pending:
+                comments = pending.popleft().result()
+                # A short page is the last one, anything requested after it is empty
+                if len(comments) < page_size:
+                    yield from comments[skip:]
+                    return
+                pending.append(pool.submit(get_comments_page, client, ref_id, next_page, page_size))
+                next_page += 1
+                yield from comments[skip:]
+                skip = 0
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def comment_digest_key(ref_id: int) -> str:
+    """Cache key of a referendum's comment digest"""
+    return f"comments:{ref_id}"
+
+
+def get_comment_digest(ref_id: int, cache: Optional[CacheBackend] = None) -> CommentDigest:
+    """Returns the discussion digest of a referendum, fetching only comments not seen before
+
+    Digests are kept in the cache, so with a shared cache backend every process and later
+    run resumes from the comments already folded in.
+    """
+    cache = cache or get_cache()
+    key = comment_digest_key(ref_id)
+
+    # One worker catches the digest up at a time; the others then find it current
+    with cache.lock(key):
+        saved = cache.get_json(key)
+        digest = CommentDigest.from_dict(saved) if saved else CommentDigest(ref_id)
+        try:
+            for comment in iter_comments(ref_id, start=digest.seen):
+                digest.add(comment)
+        finally:
+            # Keep whatever was folded in, even if a later page failed
+            cache.set_json(key, digest.to_dict())
+    return digest
+
+
+def build_summary_input(content: str, digest: Optional[CommentDigest]) -> str:
+    """Appends the discussion digest to the referendum content for summarisation"""
+    if digest is None or not digest.seen:
+        return content
+    return f"{content}\n\nCommunity discussion digest:\n{digest.render()}"
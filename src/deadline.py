@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+from backends import extractive_summary, get_backend
+from cache import CacheBackend, cached_summary, get_cache, latest_summary_key, summary_key
+
+# How a summary was produced
+PATH_CACHED = "cached"
+PATH_MODEL = "model"
+PATH_PREVIOUS = "previous"
+PATH_EXTRACTIVE = "extractive"
+FALLBACK_PATHS = (PATH_PREVIOUS, PATH_EXTRACTIVE)
+
+# Number of summaries produced by each path in this process
+SUMMARY_PATHS = Counter()
+
+
+class SummaryResult:
+    """A summary together with how it was produced and how long it took"""
+
+    def __init__(
+        self,
+        summary: Optional[str],
+        path: str,
+        elapsed: float,
+        pending: Optional[Future] = None,
+        error: Optional[Exception] = None,
+    ):
+        self.summary = summary
+        self.path = path
+        self.elapsed = elapsed
+        # Still running model summary when a fallback was returned
+        self.pending = pending
+        # Why the model failed, when the fallback stands in for a failed call
+        self.error = error
+
+    @property
+    def is_fallback(self) -> bool:
+        return self.path in FALLBACK_PATHS
+
+
+def run_in_background(fn: Callable, *args) -> Future:
+    """Runs fn(*args) on a daemon thread and returns a future of its result
+
+    Daemon threads are abandoned at exit, so a call that outlives its deadline never keeps
+    the CLI from quitting.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="summary", daemon=True).start()
+    return future
+
+
+def summarise_with_deadline(
+    ref_id: int,
+    content: str,
+    summarise: Callable[[str], Optional[str]],
+    deadline: Optional[float] = None,
+    cache: Optional[CacheBackend] = None,
+    source: Optional[str] = None,
+) -> SummaryResult:
+    """Summarises content, falling back to a quick answer if the model misses the deadline
+
+    When deadline seconds pass without a model summary, or the model fails before then, the
+    most recent cached summary of the referendum is returned, or failing that an extractive
+    summary of content. A slow model call carries on in the background and caches its
+    result, so asking again later returns the full summary. With no deadline this waits for
+    the model like cached_summary and lets its errors propagate.
+    """
+    started = time.monotonic()
+    cache = cache or get_cache()
+    source = source or get_backend().cache_id
+
+    summary = cache.get_json(summary_key(ref_id, content, source))
+    if summary is not None:
+        return _record(SummaryResult(summary, PATH_CACHED, time.monotonic() - started))
+
+    if deadline is None:
+        summary = cached_summary(ref_id, content, summarise, cache, source)
+        return _record(SummaryResult(summary, PATH_MODEL, time.monotonic() - started))
+
+    future = run_in_background(cached_summary, ref_id, content, summarise, cache, source)
+    pending, error = future, None
+    try:
+        summary = future.result(timeout=deadline)
+        return _record(SummaryResult(summary, PATH_MODEL, time.monotonic() - started))
+    except FutureTimeoutError:
+        pass
+    except Exception as e:
+        pending, error = None, e
+
+    previous = cache.get_json(latest_summary_key(ref_id, source))
+    if previous is not None:
+        path, summary = PATH_PREVIOUS, previous
+    else:
+        path, summary = PATH_EXTRACTIVE, extractive_summary(content)
+    return _record(SummaryResult(summary, path, time.monotonic() - started, pending, error))
+
+
+def _record(result: SummaryResult) -> SummaryResult:
+    SUMMARY_PATHS[result.path] += 1
+    return result
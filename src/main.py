@@ -1,25 +1,69 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from importlib.metadata import PackageNotFoundError
 from importlib.metadata import version as package_version
+from typing import Optional
 
 import typer
 from dotenv import load_dotenv
 from InquirerPy.resolver import prompt
 from typing_extensions import Annotated
 
+from backends import get_backend
+from cache import (
+    REFERENDUM_TTL,
+    cached_referendum,
+    get_cache,
+    latest_summary_key,
+    referendum_key,
+)
+from comments import build_summary_input, get_comment_digest
+from deadline import PATH_CACHED, SUMMARY_PATHS, run_in_background, summarise_with_deadline
+from pipeline import Pipeline
 from referendum import get_referendum, summarise_referendum
+from scheduler import BATCH, INTERACTIVE, BudgetExceeded, deferred_refs, get_scheduler
+from snapshot import get_snapshot
+from watch import (
+    DEFAULT_LISTING_LIMIT,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_POLL_INTERVAL,
+    Watcher,
+    post_webhook,
+)
 
 # Load API keys from .env file
 load_dotenv()
 
+# Seconds the interactive menu waits for an AI summary before showing a quick one
+DEFAULT_SUMMARY_DEADLINE = 20.0
+
+# Comments are skipped when less of the deadline than this is left, and may otherwise use
+# up to this share of what remains
+MIN_COMMENTS_BUDGET = 5.0
+COMMENTS_BUDGET_SHARE = 0.5
+
 # Create a Typer app instance
 app = typer.Typer()
 
 
-def handle_display_ai_summary(ref: int):
+def handle_display_ai_summary(ref: int, deadline: Optional[float] = None):
     """Handles the generation of AI summary for a referendum."""
+    # The deadline covers the whole request, fetching the referendum and comments included
+    started = time.monotonic()
+
+    def remaining() -> Optional[float]:
+        if deadline is None:
+            return None
+        return max(deadline - (time.monotonic() - started), 0.0)
+
     try:
         # Fetch referendum data
-        result = get_referendum(ref)
+        result = cached_referendum(ref, get_referendum)
     except Exception as e:
         print(f"Unexpected error: {e}")
         return False
@@ -29,22 +73,77 @@ def handle_display_ai_summary(ref: int):
         print("No content available for this referendum.")
         return
 
-    response = summarise_referendum(content)
-    print(response)
-    print("------ Summary generated successfully ---")
+    # Fold the discussion into the prompt so controversy can be summarised, as long as
+    # fetching it leaves the model enough of the deadline
+    if result.get("comments_count", 0):
+        budget = remaining()
+        if budget is not None and budget < MIN_COMMENTS_BUDGET:
+            print("Not enough time left to fetch comments, summarising without them.")
+        else:
+            timeout = None if budget is None else budget * COMMENTS_BUDGET_SHARE
+            try:
+                digest = run_in_background(get_comment_digest, ref).result(timeout)
+                content = build_summary_input(content, digest)
+            except FutureTimeoutError:
+                print("Comments are taking too long, summarising without them.")
+            except Exception as e:
+                print(f"Could not fetch comments, summarising without them: {e}")
+
+    def summarise(text: str):
+        # Interactive requests jump ahead of queued batch summaries
+        return get_scheduler().call(INTERACTIVE, summarise_referendum, text)
+
+    try:
+        response = summarise_with_deadline(ref, content, summarise, remaining())
+    except BudgetExceeded as e:
+        print(f"{e}, try again tomorrow.")
+        return False
+    print(response.summary)
+    if response.error is not None:
+        print(
+            f"------ AI summary failed ({response.error}); "
+            f"quick {response.path} summary shown instead ---"
+        )
+    elif response.is_fallback:
+        print(
+            f"------ Quick {response.path} summary shown after {response.elapsed:.1f}s; "
+            "choose Generate AI Summary again for the full summary ---"
+        )
+    elif response.path == PATH_CACHED:
+        print("------ Summary loaded from cache ---")
+    else:
+        get_snapshot().update(ref, summary=response.summary, source=get_backend().cache_id)
+        print("------ Summary generated successfully ---")
 
 
 def handle_display_metadata(ref: int):
     """Handles the display of referendum metadata."""
     print(f"Fetching metadata for Referendum ID: ${ref}")
 
+    # Show saved metadata straight away when nothing fresher is cached, and revalidate it
+    saved = None
+    if get_cache().get(referendum_key(ref)) is None:
+        saved = get_snapshot().get(ref)
+    if saved and saved.get("referendum"):
+        print_metadata(ref, saved["referendum"])
+        age = int(time.time() - saved["saved_at"])
+        print(f"(Saved {age}s ago, refreshing in the background)")
+        refresh_in_background(ref)
+        return
+
     try:
         # Fetch referendum data
-        result = get_referendum(ref)
+        result = cached_referendum(ref, get_referendum)
     except Exception as e:
         print(f"Unexpected error: {e}")
         return
 
+    print_metadata(ref, result)
+    get_snapshot().update(ref, referendum=result)
+
+
+def print_metadata(ref: int, result: dict):
+    """Prints the metadata of a referendum."""
     print(f"Referendum ID: {ref}")
     print(f"Title: {result.get('title', 'Unknown')}")
     print(f"Status: {result.get('status', 'Unknown')}")
@@ -52,18 +151,69 @@ def handle_display_metadata(ref: int):
     print(f"Comments Count: {result.get('comments_count', 0)}")
 
 
+def refresh_in_background(ref: int) -> threading.Thread:
+    """Refetches a referendum on a background thread, updating the cache and snapshot."""
+
+    def refresh():
+        try:
+            result = get_referendum(ref)
+        except Exception:
+            # The saved data stays on screen; the next display will try again
+            return
+        get_cache().set_json(referendum_key(ref), result, REFERENDUM_TTL)
+        get_snapshot().update(ref, referendum=result)
+
+    thread = threading.Thread(target=refresh, daemon=True)
+    thread.start()
+    return thread
+
+
+@contextmanager
+def ndjson_writer(output: Optional[str]):
+    """Yields a function writing one JSON record per line to output, or stdout."""
+    stream = open(output, "a", encoding="utf-8") if output else sys.stdout
+
+    def write(record: dict):
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stream.flush()
+
+    try:
+        yield write
+    finally:
+        if output:
+            stream.close()
+
+
 def handle_help(ctx: typer.Context):
     """Handles the help command."""
     typer.echo(ctx.get_help())
 
 
 @app.command()
-def referendum(ref: Annotated[int, typer.Option()], ctx: typer.Context):
+def referendum(
+    ref: Annotated[int, typer.Option()],
+    ctx: typer.Context,
+    deadline: Annotated[
+        float, typer.Option(help="Seconds to wait for the AI summary before falling back.")
+    ] = DEFAULT_SUMMARY_DEADLINE,
+):
     """Provides tooling to inspect and generate summaries for OpenGov referenda."""
 
     # Print ref
     print(f"Ready to work with Referendum ID: {ref}")
 
+    # Warm start: render what was saved last time while it is revalidated
+    saved = get_snapshot().get(ref)
+    if saved:
+        # Seed the fallback summary only if it came from this backend and nothing newer
+        # is cached already, e.g. by another session sharing the cache
+        source = get_backend().cache_id
+        key = latest_summary_key(ref, source)
+        if saved.get("summary") and saved.get("source") == source and get_cache().get(key) is None:
+            get_cache().set_json(key, saved["summary"])
+        if saved.get("referendum"):
+            handle_display_metadata(ref)
+
     while True:
         # Prompt user for action
         questions = [
@@ -86,7 +236,7 @@ def referendum(ref: Annotated[int, typer.Option()], ctx: typer.Context):
             handle_display_metadata(ref)
 
         elif choice == "Generate AI Summary":
-            handle_display_ai_summary(ref)
+            handle_display_ai_summary(ref, deadline)
         elif choice == "Help":
             handle_help(ctx)
         elif choice == "Exit":
@@ -95,6 +245,65 @@ def referendum(ref: Annotated[int, typer.Option()], ctx: typer.Context):
             break
 
 
+@app.command()
+def batch(
+    start: Annotated[int, typer.Option(help="First referendum ID to process.")],
+    end: Annotated[int, typer.Option(help="Last referendum ID to process (inclusive).")],
+    output: Annotated[Optional[str], typer.Option(help="NDJSON file to write to.")] = None,
+    workers: Annotated[Optional[int], typer.Option(help="Parse processes.")] = None,
+    summarise: Annotated[bool, typer.Option(help="Generate summaries.")] = True,
+):
+    """Fetches and summarises a range of referenda, writing one JSON record per line."""
+    pipeline = Pipeline(workers=workers, summarise=summarise)
+    refs = list(range(start, end + 1))
+    if summarise:
+        # Retry summaries an earlier run deferred because the daily budget ran out
+        deferred = [ref for ref in deferred_refs(BATCH) if not start <= ref <= end]
+        if deferred:
+            print(f"Retrying {len(deferred)} deferred summaries", file=sys.stderr)
+        refs += deferred
+
+    with ndjson_writer(output) as write:
+        pipeline.run(refs, on_result=write)
+
+    # Stage metrics go to stderr so stdout stays valid NDJSON
+    for stage in pipeline.metrics_snapshot():
+        print(json.dumps(stage), file=sys.stderr)
+    print(json.dumps(get_scheduler().metrics()), file=sys.stderr)
+    print(json.dumps({"summary_paths": dict(SUMMARY_PATHS)}), file=sys.stderr)
+
+
+@app.command()
+def watch(
+    interval: Annotated[float, typer.Option(help="Seconds between polls.")] = DEFAULT_POLL_INTERVAL,
+    min_interval: Annotated[float, typer.Option(help="Shortest interval.")] = DEFAULT_MIN_INTERVAL,
+    max_interval: Annotated[float, typer.Option(help="Longest interval.")] = DEFAULT_MAX_INTERVAL,
+    limit: Annotated[int, typer.Option(help="Referenda per poll.")] = DEFAULT_LISTING_LIMIT,
+    output: Annotated[Optional[str], typer.Option(help="NDJSON file to write to.")] = None,
+    webhook: Annotated[Optional[str], typer.Option(help="URL to POST events to.")] = None,
+    summarise: Annotated[bool, typer.Option(help="Summarise new referenda.")] = True,
+    max_polls: Annotated[int, typer.Option(help="Stop after this many polls (0 = never).")] = 0,
+):
+    """Watches for new referenda and status changes, summarising new proposals."""
+    watcher = Watcher(interval, min_interval, max_interval, limit, summarise)
+
+    with ndjson_writer(output) as write:
+
+        def on_event(event: dict):
+            if webhook:
+                try:
+                    post_webhook(webhook, event)
+                except Exception as e:
+                    print(f"Webhook delivery failed: {e}", file=sys.stderr)
+            if output or not webhook:
+                write(event)
+
+        try:
+            watcher.run(on_event, max_polls=max_polls)
+        except KeyboardInterrupt:
+            print("Stopped watching.", file=sys.stderr)
+
+
 @app.command()
 def version():
     """Prints the current version of the OpenGov Summary Python package."""
@@ -0,0 +1,304 @@
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Optional
+
+import httpx
+
+from backends import SummaryBackend, clean_text, get_backend
+from cache import REFERENDUM_TTL, CacheBackend, get_cache, referendum_key
+from deadline import summarise_with_deadline
+from referendum import (
+    POLKASSEMBLY_BASE_URL,
+    REQUEST_TIMEOUT,
+    decode_referendum,
+    get_referendum_payload,
+    summarise_referendum,
+)
+from scheduler import (
+    BATCH,
+    BULK,
+    BudgetExceeded,
+    SummaryScheduler,
+    defer,
+    deferred_refs,
+    get_scheduler,
+    resolve_deferred,
+)
+
+# Default number of in-flight items allowed between two stages
+DEFAULT_QUEUE_SIZE = 64
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+# Marks the end of the stream on a stage queue
+_DONE = object()
+
+# Parse workers are started from a clean process rather than forked from this one, whose
+# scheduler and cache threads may hold locks a forked child would inherit held
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def normalise_content(content: str) -> str:
+    """Strips markup and collapses whitespace, keeping paragraph breaks"""
+    text = clean_text(content).replace("\r\n", "\n")
+    text = _SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def parse_payload(payload: bytes) -> dict:
+    """Decodes a raw referendum payload and cleans its content
+
+    Runs inside worker processes, so it must stay a picklable module-level function.
+    """
+    return clean_record(decode_referendum(payload))
+
+
+def clean_record(record: dict) -> dict:
+    """Returns a copy of a decoded referendum with its content cleaned for output
+
+    Runs inside worker processes, so it must stay a picklable module-level function.
+    """
+    record = dict(record)
+    if record.get("content"):
+        record["content"] = normalise_content(record["content"])
+    return record
+
+
+def decode_payload(payload: bytes) -> tuple:
+    """Decodes a raw referendum payload into the record as fetched and its cleaned copy
+
+    The record as fetched is what the interactive CLI and watch mode cache and summarise,
+    so batch stores and summarises that and only outputs the cleaned copy. Runs inside
+    worker processes, so it must stay a picklable module-level function.
+    """
+    record = decode_referendum(payload)
+    return record, clean_record(record)
+
+
+class StageMetrics:
+    """Counters for a single pipeline stage and the queue feeding it"""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.processed = 0
+        self.failed = 0
+
+    def observe(self, queue: asyncio.Queue):
+        self.queue_depth = queue.qsize()
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+class Pipeline:
+    """Fetches, parses and summarises many referenda concurrently
+
+    Fetching and summarising are I/O bound and run as asyncio tasks, while decoding and
+    text cleaning run in a process pool sized to the number of cores. Stages are joined
+    by bounded queues, so a slow stage holds back the ones before it instead of letting
+    payloads pile up in memory.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        fetch_concurrency: int = 8,
+        summarise_concurrency: int = 4,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        summarise: bool = True,
+        backend: Optional[SummaryBackend] = None,
+        cache: Optional[CacheBackend] = None,
+        scheduler: Optional[SummaryScheduler] = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.fetch_concurrency = fetch_concurrency
+        self.summarise_concurrency = summarise_concurrency
+        self.queue_size = queue_size
+        self.summarise = summarise
+        self.backend = backend
+        self.cache = cache or get_cache()
+        self.scheduler = scheduler or get_scheduler()
+        # Referenda deferred by an earlier run, cleared as their summaries are produced
+        self._deferred = set()
+        self.metrics = {
+            "fetch": StageMetrics("fetch", fetch_concurrency),
+            "parse": StageMetrics("parse", self.workers),
+            "summarise": StageMetrics("summarise", summarise_concurrency if summarise else 0),
+        }
+
+    def run(self, refs: Iterable[int], on_result: Optional[Callable[[dict], None]] = None):
+        """Processes refs and returns their records in completion order"""
+        return asyncio.run(self.run_async(refs, on_result))
+
+    async def run_async(
+        self, refs: Iterable[int], on_result: Optional[Callable[[dict], None]] = None
+    ) -> list:
+        fetch_queue = asyncio.Queue(self.queue_size)
+        parse_queue = asyncio.Queue(self.queue_size)
+        summarise_queue = asyncio.Queue(self.queue_size)
+        results = []
+        if self.summarise:
+            self._deferred = set(await asyncio.to_thread(deferred_refs, BATCH, self.cache))
+
+        async def collect(record: dict):
+            results.append(record)
+            if on_result:
+                on_result(record)
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context(_START_METHOD)
+        ) as executor:
+            async with httpx.AsyncClient(
+                base_url=POLKASSEMBLY_BASE_URL, timeout=REQUEST_TIMEOUT
+            ) as client:
+                stages = [
+                    self._feed(refs, fetch_queue, self.fetch_concurrency),
+                    self._stage(
+                        "fetch",
+                        fetch_queue,
+                        parse_queue,
+                        self.fetch_concurrency,
+                        self.workers,
+                        lambda record: self._fetch(client, record),
+                    ),
+                    self._stage(
+                        "parse",
+                        parse_queue,
+                        summarise_queue,
+                        self.workers,
+                        max(self.summarise_concurrency, 1),
+                        lambda record: self._parse(executor, record),
+                    ),
+                    self._stage(
+                        "summarise",
+                        summarise_queue,
+                        None,
+                        max(self.summarise_concurrency, 1),
+                        0,
+                        self._summarise,
+                        collect,
+                    ),
+                ]
+                await asyncio.gather(*stages)
+
+        return results
+
+    def metrics_snapshot(self) -> list:
+        """Returns per-stage queue depth and throughput counters"""
+        return [stage.as_dict() for stage in self.metrics.values()]
+
+    async def _feed(self, refs: Iterable[int], queue: asyncio.Queue, consumers: int):
+        for ref in refs:
+            await queue.put({"ref": ref})
+            self.metrics["fetch"].observe(queue)
+        for _ in range(consumers):
+            await queue.put(_DONE)
+
+    async def _stage(
+        self,
+        name: str,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        concurrency: int,
+        downstream: int,
+        work,
+        sink=None,
+    ):
+        metrics = self.metrics[name]
+        next_metrics = None
+        if outbox is not None:
+            names = list(self.metrics)
+            next_metrics = self.metrics[names[names.index(name) + 1]]
+
+        async def worker():
+            while True:
+                record = await inbox.get()
+                metrics.observe(inbox)
+                if record is _DONE:
+                    return
+                # Records that failed upstream are passed through untouched
+                if "error" not in record:
+                    try:
+                        record = await work(record)
+                        metrics.processed += 1
+                    except Exception as e:
+                        metrics.failed += 1
+                        record = {"ref": record["ref"], "error": f"{name}: {e}"}
+                if outbox is not None:
+                    await outbox.put(record)
+                    next_metrics.observe(outbox)
+                else:
+                    await sink(record)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        if outbox is not None:
+            for _ in range(downstream):
+                await outbox.put(_DONE)
+
+    async def _fetch(self, client: httpx.AsyncClient, record: dict) -> dict:
+        # Referenda fetched recently by any process sharing the cache are not fetched again
+        key = referendum_key(record["ref"])
+        cached = await asyncio.to_thread(self.cache.get_json, key)
+        if cached is not None:
+            return {"ref": record["ref"], "referendum": cached}
+        payload = await get_referendum_payload(client, record["ref"])
+        return {"ref": record["ref"], "payload": payload}
+
+    async def _parse(self, executor: Executor, record: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        if "payload" in record:
+            referendum, cleaned = await loop.run_in_executor(
+                executor, decode_payload, record["payload"]
+            )
+            key = referendum_key(record["ref"])
+            await asyncio.to_thread(self.cache.set_json, key, referendum, REFERENDUM_TTL)
+        else:
+            referendum = record["referendum"]
+            cleaned = await loop.run_in_executor(executor, clean_record, referendum)
+        # The content as fetched travels along for summarising and is dropped from output
+        return {"ref": record["ref"], **cleaned, "source_content": referendum.get("content")}
+
+    async def _summarise(self, record: dict) -> dict:
+        record = dict(record)
+        content = record.pop("source_content", None)
+        summary = None
+        if self.summarise and content:
+            # Goes through summarise_with_deadline, without a deadline, so cache hits and
+            # model calls are counted in SUMMARY_PATHS
+            try:
+                result = await asyncio.to_thread(
+                    summarise_with_deadline,
+                    record["ref"],
+                    content,
+                    lambda text: self.scheduler.call(
+                        BULK, partial(summarise_referendum, backend=self.backend), text
+                    ),
+                    None,
+                    self.cache,
+                    (self.backend or get_backend()).cache_id,
+                )
+            except BudgetExceeded:
+                # Remembered in the cache so the next batch run picks it up
+                await asyncio.to_thread(defer, record["ref"], BATCH, self.cache)
+                raise
+            summary = result.summary
+            if record["ref"] in self._deferred:
+                await asyncio.to_thread(resolve_deferred, record["ref"], BATCH, self.cache)
+        return {**record, "summary": summary}
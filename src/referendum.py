@@ -1,55 +1,63 @@
-from typing import Optional
+import json
+from typing import Iterable, Optional
 
 import httpx
-import openai
+
+from backends import SummaryBackend, get_backend
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    orjson = None
 
 # Base URL for PolkAssembly API to fetch referendum data
 POLKASSEMBLY_BASE_URL = "https://api.polkassembly.io/api/v1"
 
+# Seconds to wait on each PolkAssembly request before giving up
+REQUEST_TIMEOUT = 10
+
+# Fields of the on-chain post the CLI actually uses. Comments, reactions and timeline
+# data make up most of the payload and are dropped straight after decoding.
+REFERENDUM_FIELDS = ("title", "status", "content", "tags", "comments_count")
+
 
-def get_referendum(ref_id: int):
+def decode_referendum(payload: bytes, fields: Optional[Iterable[str]] = REFERENDUM_FIELDS) -> dict:
+    """Decodes a raw on-chain post payload, keeping only the requested fields
+
+    Uses orjson when it is installed and falls back to the standard library otherwise.
+    Pass fields=None to keep the whole document.
+    """
+    data = orjson.loads(payload) if orjson is not None else json.loads(payload)
+    if fields is None:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+
+def get_referendum(ref_id: int, fields: Optional[Iterable[str]] = REFERENDUM_FIELDS):
     """Fetches referendum data from PolkAssembly API and returns relevant metadata"""
     url = "/posts/on-chain-post"
     params = {"postId": ref_id, "proposalType": "referendums_v2"}
     headers = {"x-network": "polkadot"}
 
-    with httpx.Client(base_url=POLKASSEMBLY_BASE_URL, timeout=None) as client:
+    with httpx.Client(base_url=POLKASSEMBLY_BASE_URL, timeout=REQUEST_TIMEOUT) as client:
         response = client.get(url, params=params, headers=headers)
         response.raise_for_status()
-        return response.json()
-
-
-def summarise_referendum(content: str) -> Optional[str]:
-    """Generates a summary of the referendum content using OpenAI's GPT model"""
-    response = openai.responses.create(
-        model="gpt-4.1",
-        input=[
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "input_text",
-                        "text": (
-                            "You are a neutral Polkadot governance analyst.\n"
-                            "Summarise the referendum in 150-200 words.\n"
-                            "• Purpose\n• Funding/mechanics\n"
-                            "• Potential impact\n• Controversial points (if any)\n\n"
-                            "The output of this summary is for the command line, so it is "
-                            "imperative that plain text is output - not markdown, not HTML, etc. "
-                            "Just plain text."
-                        ),
-                    }
-                ],
-            },
-            {"role": "user", "content": content},
-        ],
-        text={"format": {"type": "text"}},
-        reasoning={},
-        tools=[],
-        temperature=1,
-        max_output_tokens=2048,
-        top_p=1,
-        store=True,
-    )
-
-    return response.output_text
+        return decode_referendum(response.content, fields)
+
+
+async def get_referendum_payload(client: httpx.AsyncClient, ref_id: int) -> bytes:
+    """Fetches the raw, undecoded referendum payload using a shared async client"""
+    url = "/posts/on-chain-post"
+    params = {"postId": ref_id, "proposalType": "referendums_v2"}
+    headers = {"x-network": "polkadot"}
+
+    response = await client.get(url, params=params, headers=headers)
+    response.raise_for_status()
+    return response.content
+
+
+def summarise_referendum(content: str, backend: Optional[SummaryBackend] = None) -> Optional[str]:
+    """Generates a summary of the referendum content using the configured summary backend"""
+    if backend is None:
+        backend = get_backend()
+    return backend.summarise(content)
@@ -0,0 +1,401 @@
+import datetime
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Callable, Optional
+
+from backends import take_usage
+from cache import CacheBackend, get_cache
+
+# Lanes jobs can be submitted to
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+# Environment variables used to configure the shared scheduler
+DAILY_TOKENS_ENV = "SUMMARY_DAILY_TOKENS"
+CONCURRENCY_ENV = "SUMMARY_CONCURRENCY"
+
+DEFAULT_CONCURRENCY = 4
+# Maximum jobs running at once in each lane
+DEFAULT_LANE_CAPS = {INTERACTIVE: 4, BULK: 2}
+# Share of dispatches each lane gets while both have work waiting
+DEFAULT_WEIGHTS = {INTERACTIVE: 3, BULK: 1}
+# Fraction of the daily budget that bulk jobs may not touch, kept for interactive use
+DEFAULT_INTERACTIVE_RESERVE = 0.2
+
+# Rough token cost of a summary: about four characters per prompt token, plus the prompt
+# instructions and a 150-200 word answer
+CHARS_PER_TOKEN = 4
+OVERHEAD_TOKENS = 400
+
+# Number of recent waits kept per lane for the wait time statistics
+WAIT_SAMPLES = 1000
+
+# The budget and lane admission live in the cache, so every process sharing it shares
+# them. Token counters are kept a little past their day, so a run that started before
+# midnight can still settle its charges.
+TOKENS_KEY = "scheduler:tokens:{day}"
+TOKENS_TTL = 2 * 24 * 3600
+# Lane leases are expiring cache locks, one per slot under the lane cap. A lease left by a
+# crashed process is freed after LEASE_TTL; workers blocked on another process's leases
+# check again every LEASE_POLL_INTERVAL seconds.
+LEASE_NAME = "scheduler:{lane}:{slot}"
+LEASE_TTL = 300
+LEASE_POLL_INTERVAL = 0.2
+# Referenda whose bulk summaries were turned away by the budget, for a later run to retry.
+# Each command that defers summaries keeps its own list and only retries that one.
+DEFERRED_KEY = "scheduler:deferred:{origin}"
+BATCH = "batch"
+WATCH = "watch"
+DEFERRED_ORIGINS = (BATCH, WATCH)
+
+
+class BudgetExceeded(Exception):
+    """Raised when a job does not fit in what is left of the daily token budget"""
+
+
+def estimate_tokens(content: str) -> int:
+    """Estimates the tokens a summary of content will use"""
+    return len(content) // CHARS_PER_TOKEN + OVERHEAD_TOKENS
+
+
+class LaneStats:
+    """Counters and wait times of one scheduler lane"""
+
+    def __init__(self, lane: str, cap: int, weight: int):
+        self.lane = lane
+        self.cap = cap
+        self.weight = weight
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def as_dict(self, queued: int) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "lane": self.lane,
+            "cap": self.cap,
+            "weight": self.weight,
+            "queued": queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "deferred": self.deferred,
+            "wait_mean_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "wait_p95_ms": waits[int(0.95 * (len(waits) - 1))] * 1000 if waits else 0.0,
+            "wait_max_ms": waits[-1] * 1000 if waits else 0.0,
+        }
+
+
+class _Job:
+    def __init__(self, lane: str, fn: Callable[[str], Optional[str]], content: str):
+        self.lane = lane
+        self.fn = fn
+        self.content = content
+        self.tokens = estimate_tokens(content)
+        self.submitted_at = time.monotonic()
+        self.future = Future()
+        # Budget counter the job was charged to, and the lease it runs under
+        self.tokens_key = None
+        self.lease = None
+
+
+class SummaryScheduler:
+    """Runs summary jobs from interactive and bulk lanes against one shared quota
+
+    Worker threads pick the next job by weighted fair share between lanes that have work
+    waiting and room under their concurrency cap, so a long batch cannot starve
+    interactive requests. Lane caps and the daily token budget are kept in the cache, so
+    with a shared cache backend they hold across every process using it, e.g. the
+    interactive CLI next to a batch run; the fair share order applies within a process.
+
+    Each dispatch is charged its estimated tokens, corrected to the usage the backend
+    reports once the call returns. Bulk jobs may not spend the share of the budget
+    reserved for interactive use. Jobs that no longer fit fail with BudgetExceeded:
+    interactive ones are counted as dropped, bulk ones as deferred, and callers record
+    deferred referenda with defer so a later run retries them.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        lane_caps: Optional[dict] = None,
+        weights: Optional[dict] = None,
+        daily_tokens: Optional[int] = None,
+        interactive_reserve: float = DEFAULT_INTERACTIVE_RESERVE,
+        cache: Optional[CacheBackend] = None,
+    ):
+        lane_caps = {**DEFAULT_LANE_CAPS, **(lane_caps or {})}
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.concurrency = concurrency
+        self.daily_tokens = daily_tokens
+        self.interactive_reserve = interactive_reserve
+        self.cache = cache or get_cache()
+        self.stats = {lane: LaneStats(lane, lane_caps[lane], weights[lane]) for lane in LANES}
+
+        self._queues = {lane: deque() for lane in LANES}
+        self._pass = {lane: 0.0 for lane in LANES}
+        self._condition = threading.Condition()
+        self._workers = []
+        # Lanes whose slots were all leased by other processes, until they are tried again
+        self._blocked_until = {lane: 0.0 for lane in LANES}
+
+    @property
+    def tokens_used(self) -> int:
+        """Tokens charged today by every process sharing the cache"""
+        return int(self.cache.get(self._tokens_key()) or 0)
+
+    def has_budget(self, lane: str, tokens: int = OVERHEAD_TOKENS) -> bool:
+        """Returns whether a job of about tokens still fits in the lane's share of today"""
+        if self.daily_tokens is None:
+            return True
+        return self.tokens_used + tokens <= self._limit(lane)
+
+    def submit(self, lane: str, fn: Callable[[str], Optional[str]], content: str) -> Future:
+        """Queues fn(content) in a lane and returns a future for its result"""
+        if lane not in self._queues:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+        job = _Job(lane, fn, content)
+        with self._condition:
+            queue = self._queues[lane]
+            if not queue and self.stats[lane].running == 0:
+                # A lane returning from idle starts level with the busy lanes instead of
+                # spending the share it built up while it had nothing to do
+                busy = [self._pass[other] for other in LANES if self._queues[other]]
+                if busy:
+                    self._pass[lane] = max(self._pass[lane], min(busy))
+            queue.append(job)
+            self._start_workers()
+            self._condition.notify()
+        return job.future
+
+    def call(self, lane: str, fn: Callable[[str], Optional[str]], content: str) -> Optional[str]:
+        """Runs fn(content) through the scheduler and waits for the result"""
+        return self.submit(lane, fn, content).result()
+
+    def metrics(self) -> dict:
+        """Returns queue lengths, wait times and budget use for every lane"""
+        tokens_used = self.tokens_used
+        deferred = sum(len(deferred_refs(origin, self.cache)) for origin in DEFERRED_ORIGINS)
+        with self._condition:
+            return {
+                "tokens_used": tokens_used,
+                "daily_tokens": self.daily_tokens,
+                "deferred_refs": deferred,
+                "lanes": [self.stats[lane].as_dict(len(self._queues[lane])) for lane in LANES],
+            }
+
+    def _start_workers(self):
+        while len(self._workers) < self.concurrency:
+            worker = threading.Thread(target=self._work, daemon=True, name="summary-scheduler")
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            job = self._dispatch()
+
+            error = None
+            take_usage()
+            try:
+                result = job.fn(job.content)
+            except Exception as e:
+                result, error = None, e
+
+            # Settle the charge with what the backend says the call really used
+            used = take_usage()
+            try:
+                if used is not None and used != job.tokens:
+                    self.cache.incr(job.tokens_key, used - job.tokens, TOKENS_TTL)
+            except Exception:
+                # The estimate stays charged; the summary itself is still good
+                pass
+            self._release_lease(job.lease)
+            self._finish(job, result, error)
+
+    def _dispatch(self) -> _Job:
+        """Waits for a job that gets a lease and fits the budget, and returns it
+
+        Only picking the job holds the condition; the lease and the charge are cache round
+        trips, so they run outside it and never hold up submit or the other workers.
+        """
+        while True:
+            with self._condition:
+                job = self._take_job()
+                while job is None:
+                    # Leases held by other processes are released without a notification
+                    self._condition.wait(self._lease_wait())
+                    job = self._take_job()
+
+            try:
+                job.lease = self._acquire_lease(job.lane)
+                fits = job.lease is None or self._charge(job)
+            except Exception as e:
+                # The shared state is unreachable, so the job fails instead of the worker
+                if job.lease is not None:
+                    self._release_lease(job.lease)
+                self._finish(job, None, e)
+                continue
+
+            if job.lease is None:
+                # Every slot of the lane is taken by other processes; the job goes back to
+                # the front of its lane, which is passed over until a lease may have freed up
+                with self._condition:
+                    self._unpick(job)
+                    self._queues[job.lane].appendleft(job)
+                    self._blocked_until[job.lane] = time.monotonic() + LEASE_POLL_INTERVAL
+                    self._condition.notify_all()
+                continue
+
+            if not fits:
+                self._release_lease(job.lease)
+                with self._condition:
+                    self._unpick(job)
+                    stats = self.stats[job.lane]
+                    if job.lane == INTERACTIVE:
+                        stats.dropped += 1
+                    else:
+                        stats.deferred += 1
+                    self._condition.notify_all()
+                job.future.set_exception(
+                    BudgetExceeded(f"Daily token budget of {self.daily_tokens} exhausted")
+                )
+                continue
+
+            with self._condition:
+                self.stats[job.lane].waits.append(time.monotonic() - job.submitted_at)
+            return job
+
+    def _take_job(self) -> Optional[_Job]:
+        """Takes the next job by fair share, reserving its slot; called with the condition held"""
+        if sum(stats.running for stats in self.stats.values()) >= self.concurrency:
+            return None
+        now = time.monotonic()
+        ready = [
+            lane
+            for lane in LANES
+            if self._queues[lane]
+            and self.stats[lane].running < self.stats[lane].cap
+            and self._blocked_until[lane] <= now
+        ]
+        if not ready:
+            return None
+        lane = min(ready, key=lambda name: self._pass[name])
+        stats = self.stats[lane]
+        stats.running += 1
+        self._pass[lane] += 1 / stats.weight
+        return self._queues[lane].popleft()
+
+    def _unpick(self, job: _Job):
+        """Gives back the slot and share reserved by _take_job; called with the condition held"""
+        stats = self.stats[job.lane]
+        stats.running -= 1
+        self._pass[job.lane] -= 1 / stats.weight
+
+    def _lease_wait(self) -> Optional[float]:
+        """Returns how long until a lane passed over for leases is tried again, if any is"""
+        now = time.monotonic()
+        waits = [until - now for lane, until in self._blocked_until.items() if self._queues[lane]]
+        waits = [wait for wait in waits if wait > 0]
+        return min(waits) if waits else None
+
+    def _finish(self, job: _Job, result: Optional[str], error: Optional[Exception]):
+        with self._condition:
+            stats = self.stats[job.lane]
+            stats.running -= 1
+            if error is None:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+            self._condition.notify_all()
+
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+
+    def _acquire_lease(self, lane: str) -> Optional[tuple]:
+        for slot in range(self.stats[lane].cap):
+            name = LEASE_NAME.format(lane=lane, slot=slot)
+            token = self.cache.acquire_lock(name, LEASE_TTL)
+            if token is not None:
+                return name, token
+        return None
+
+    def _release_lease(self, lease: tuple):
+        try:
+            self.cache.release_lock(*lease)
+        except Exception:
+            # An unreleased lease expires after LEASE_TTL
+            pass
+
+    def _charge(self, job: _Job) -> bool:
+        """Charges a job to today's budget, or refunds it and returns False if it is over"""
+        job.tokens_key = self._tokens_key()
+        # Charging first and refunding on overrun means concurrent processes can turn a
+        # job away needlessly, but never spend past the budget together
+        used = self.cache.incr(job.tokens_key, job.tokens, TOKENS_TTL)
+        if self.daily_tokens is None or used <= self._limit(job.lane):
+            return True
+        self.cache.incr(job.tokens_key, -job.tokens, TOKENS_TTL)
+        return False
+
+    def _limit(self, lane: str) -> int:
+        if lane == BULK:
+            return int(self.daily_tokens * (1 - self.interactive_reserve))
+        return self.daily_tokens
+
+    def _tokens_key(self) -> str:
+        return TOKENS_KEY.format(day=datetime.date.today().isoformat())
+
+
+def defer(ref_id: int, origin: str, cache: Optional[CacheBackend] = None):
+    """Records a referendum whose bulk summary was deferred by the budget, for origin to retry"""
+    cache = cache or get_cache()
+    key = DEFERRED_KEY.format(origin=origin)
+    with cache.lock(key):
+        refs = set(cache.get_json(key) or [])
+        if ref_id not in refs:
+            refs.add(ref_id)
+            cache.set_json(key, sorted(refs))
+
+
+def resolve_deferred(ref_id: int, origin: str, cache: Optional[CacheBackend] = None):
+    """Forgets a deferred referendum once its summary has been produced"""
+    cache = cache or get_cache()
+    key = DEFERRED_KEY.format(origin=origin)
+    with cache.lock(key):
+        refs = set(cache.get_json(key) or [])
+        if ref_id in refs:
+            refs.discard(ref_id)
+            cache.set_json(key, sorted(refs))
+
+
+def deferred_refs(origin: str, cache: Optional[CacheBackend] = None) -> list:
+    """Returns the referenda deferred by origin whose bulk summaries are waiting for budget"""
+    return (cache or get_cache()).get_json(DEFERRED_KEY.format(origin=origin)) or []
+
+
+@lru_cache(maxsize=None)
+def create_scheduler(
+    concurrency: int = DEFAULT_CONCURRENCY, daily_tokens: Optional[int] = None
+) -> SummaryScheduler:
+    """Builds a shared summary scheduler"""
+    return SummaryScheduler(concurrency=concurrency, daily_tokens=daily_tokens)
+
+
+def get_scheduler() -> SummaryScheduler:
+    """Returns the summary scheduler configured by the environment"""
+    daily_tokens = os.environ.get(DAILY_TOKENS_ENV)
+    return create_scheduler(
+        int(os.environ.get(CONCURRENCY_ENV) or DEFAULT_CONCURRENCY),
+        int(daily_tokens) if daily_tokens else None,
+    )
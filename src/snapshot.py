@@ -0,0 +1,176 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, writers are not serialised
+    fcntl = None
+
+# Environment variable overriding where the snapshot is kept
+SNAPSHOT_PATH_ENV = "SNAPSHOT_PATH"
+DEFAULT_SNAPSHOT_PATH = Path.home() / ".cache" / "opengov-summary" / "snapshot.bin"
+
+# Number of most recently viewed referenda kept in the snapshot
+DEFAULT_SNAPSHOT_SIZE = 50
+
+# File layout: magic, index length, JSON index of {ref: [offset, length, viewed_at]}, then
+# one JSON record per referendum, with offsets counted from the end of the index
+_MAGIC = b"OGSNAP1\n"
+_HEADER = struct.Struct(">Q")
+
+
+class Snapshot:
+    """Recently viewed referenda and summaries, persisted between CLI runs
+
+    Opening a snapshot only reads its small index; the file is memory-mapped and each
+    record is decoded the first time it is asked for, so startup cost does not grow with
+    the number of referenda kept.
+    """
+
+    def __init__(self, path: Optional[str] = None, size: int = DEFAULT_SNAPSHOT_SIZE):
+        self.path = Path(path or os.environ.get(SNAPSHOT_PATH_ENV) or DEFAULT_SNAPSHOT_PATH)
+        self.size = size
+        self._mutex = threading.Lock()
+        self._index = None
+        self._map = None
+        self._data_start = 0
+        self._records = {}
+
+    def get(self, ref_id: int) -> Optional[dict]:
+        """Returns the saved record of a referendum, with referendum, summary and saved_at"""
+        with self._mutex:
+            self._open()
+            key = str(ref_id)
+            if key not in self._records and key in self._index:
+                self._records[key] = self._read(key)
+            return self._records.get(key)
+
+    def update(
+        self,
+        ref_id: int,
+        referendum: Optional[dict] = None,
+        summary: Optional[str] = None,
+        source: Optional[str] = None,
+    ):
+        """Records fresh data for a referendum and writes the snapshot
+
+        source is the cache_id of the backend that wrote summary.
+        """
+        with self._mutex, self._file_lock():
+            # Start from the file as it is now, other sessions may have saved since
+            self._close_map()
+            self._index = None
+            self._records = {}
+            self._open()
+            key = str(ref_id)
+            record = dict(self._read(key) or {})
+            if referendum is not None:
+                record["referendum"] = referendum
+            if summary is not None:
+                record["summary"] = summary
+                record["source"] = source
+            record["saved_at"] = time.time()
+            self._records[key] = record
+            self._save(key)
+
+    def close(self):
+        with self._mutex:
+            self._close_map()
+            self._index = None
+            self._records = {}
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialises writers across processes, so no session saves over another's entries"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def _open(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        try:
+            with open(self.path, "rb") as file:
+                if file.read(len(_MAGIC)) != _MAGIC:
+                    return
+                (index_length,) = _HEADER.unpack(file.read(_HEADER.size))
+                self._index = json.loads(file.read(index_length))
+                self._data_start = len(_MAGIC) + _HEADER.size + index_length
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, struct.error):
+            # A missing or damaged snapshot just means a cold start
+            self._index = {}
+
+    def _read(self, key: str) -> Optional[dict]:
+        if key not in self._index:
+            return None
+        try:
+            offset, length, _ = self._index[key]
+            start = self._data_start + offset
+            return json.loads(self._map[start : start + length])
+        except (TypeError, ValueError):
+            # A damaged record is treated as missing and left out of the next save
+            return None
+
+    def _save(self, touched: str):
+        now = time.time()
+        viewed = {key: entry[2] for key, entry in self._index.items()}
+        viewed[touched] = now
+        keep = sorted(viewed, key=viewed.get, reverse=True)[: self.size]
+
+        blobs = {}
+        for key in keep:
+            record = self._records.get(key) or self._read(key)
+            if record is not None:
+                blobs[key] = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+        keep = [key for key in keep if key in blobs]
+
+        index = {}
+        offset = 0
+        for key in keep:
+            index[key] = [offset, len(blobs[key]), viewed[key]]
+            offset += len(blobs[key])
+        index_bytes = json.dumps(index, separators=(",", ":")).encode()
+
+        with tempfile.NamedTemporaryFile("wb", dir=self.path.parent, delete=False) as file:
+            file.write(_MAGIC)
+            file.write(_HEADER.pack(len(index_bytes)))
+            file.write(index_bytes)
+            for key in keep:
+                file.write(blobs[key])
+        os.replace(file.name, self.path)
+
+        # Keep decoded records, but point the index at the new file
+        self._records = {key: self._records[key] for key in keep if key in self._records}
+        self._close_map()
+        self._index = None
+        self._open()
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+
+
+@lru_cache(maxsize=None)
+def open_snapshot(path: Optional[str] = None) -> Snapshot:
+    """Returns the shared Snapshot for path"""
+    return Snapshot(path)
+
+
+def get_snapshot() -> Snapshot:
+    """Returns the snapshot selected by the environment"""
+    return open_snapshot(os.environ.get(SNAPSHOT_PATH_ENV) or None)
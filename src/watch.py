@@ -0,0 +1,228 @@
+import random
+import time
+from typing import Callable, Optional
+
+import httpx
+
+from cache import CacheBackend, cached_referendum, cached_summary, get_cache
+from referendum import POLKASSEMBLY_BASE_URL, get_referendum, summarise_referendum
+from scheduler import (
+    BULK,
+    WATCH,
+    BudgetExceeded,
+    defer,
+    deferred_refs,
+    get_scheduler,
+    resolve_deferred,
+)
+
+# Polling intervals in seconds. The interval drops to the minimum whenever something
+# changes and backs off towards the maximum while nothing does.
+DEFAULT_POLL_INTERVAL = 60
+DEFAULT_MIN_INTERVAL = 30
+DEFAULT_MAX_INTERVAL = 600
+BACKOFF_FACTOR = 1.5
+JITTER = 0.1
+
+# Number of most recent referenda compared on each poll
+DEFAULT_LISTING_LIMIT = 25
+
+# Cache key holding the last seen listing, so restarts do not re-announce old referenda
+WATCH_STATE_KEY = "watch:state"
+
+# Most deferred summaries retried per poll, so a long backlog is worked off over many polls
+DEFERRED_RETRIES_PER_POLL = 5
+
+
+def get_referendum_listing(
+    client: httpx.Client, limit: int = DEFAULT_LISTING_LIMIT, etag: Optional[str] = None
+):
+    """Fetches the newest referenda, returning (posts, etag)
+
+    posts is None when the server reports the listing unchanged since etag.
+    """
+    url = "/listing/on-chain-posts"
+    params = {
+        "proposalType": "referendums_v2",
+        "page": 1,
+        "listingLimit": limit,
+        "sortBy": "newest",
+    }
+    headers = {"x-network": "polkadot"}
+    if etag:
+        headers["If-None-Match"] = etag
+
+    response = client.get(url, params=params, headers=headers)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    data = response.json()
+    posts = data.get("posts", []) if isinstance(data, dict) else data
+    return posts, response.headers.get("ETag")
+
+
+class Watcher:
+    """Polls the referendum listing and reports new referenda and status changes
+
+    The listing is requested conditionally, so an unchanged listing costs a single 304.
+    Only referenda that were not in the previous listing are fetched and summarised.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        limit: int = DEFAULT_LISTING_LIMIT,
+        summarise: bool = True,
+        cache: Optional[CacheBackend] = None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.limit = limit
+        self.summarise = summarise
+        self.cache = cache or get_cache()
+
+        state = self.cache.get_json(WATCH_STATE_KEY) or {}
+        self.etag = state.get("etag")
+        self.statuses = state.get("statuses")
+
+    def poll_once(self, client: httpx.Client) -> list:
+        """Polls the listing once and returns an event for every new or changed referendum
+
+        The ETag and statuses are only advanced once the new state has been stored, so a
+        poll that fails part way is repeated in full instead of losing its events.
+        """
+        posts, etag = get_referendum_listing(client, self.limit, self.etag)
+        if posts is None:
+            self._adapt(changed=False)
+            return []
+
+        current = {}
+        for post in posts:
+            # Entries without a usable ID cannot be tracked or fetched, so they are skipped
+            if not isinstance(post, dict):
+                continue
+            try:
+                ref = int(post.get("post_id", post.get("id")))
+            except (TypeError, ValueError):
+                continue
+            current[str(ref)] = post.get("status")
+        events = []
+
+        # The first poll only records a baseline, everything in it already exists
+        if self.statuses is not None:
+            for ref, status in current.items():
+                previous = self.statuses.get(ref)
+                if ref not in self.statuses:
+                    events.append(self._new_event(int(ref), status))
+                elif status != previous:
+                    events.append(
+                        {
+                            "event": "status_changed",
+                            "ref": int(ref),
+                            "status": status,
+                            "previous_status": previous,
+                        }
+                    )
+
+        statuses = {**(self.statuses or {}), **current}
+        self.cache.set_json(WATCH_STATE_KEY, {"etag": etag, "statuses": statuses})
+        self.etag, self.statuses = etag, statuses
+        self._adapt(changed=bool(events))
+        return events
+
+    def next_delay(self) -> float:
+        """Returns the time to wait before the next poll, with jitter applied"""
+        return self.interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def run(
+        self,
+        on_event: Callable[[dict], None],
+        max_polls: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """Polls until interrupted, or for max_polls polls when it is positive"""
+        polls = 0
+        with httpx.Client(base_url=POLKASSEMBLY_BASE_URL, timeout=30) as client:
+            while True:
+                try:
+                    for event in self.poll_once(client):
+                        on_event(event)
+                    for event in self.retry_deferred():
+                        on_event(event)
+                except Exception as e:
+                    # Back off on any error, e.g. an unreachable API or a malformed listing,
+                    # rather than stopping or hammering a struggling API
+                    self._adapt(changed=False)
+                    on_event({"event": "error", "error": str(e)})
+
+                polls += 1
+                if max_polls and polls >= max_polls:
+                    return
+                sleep(self.next_delay())
+
+    def retry_deferred(self) -> list:
+        """Summarises referenda watch deferred for budget, returning an event for each
+
+        Nothing is retried while the bulk budget is still exhausted, at most
+        DEFERRED_RETRIES_PER_POLL referenda are tried per poll, and referenda deferred by
+        batch are left for the next batch run.
+        """
+        if not self.summarise:
+            return []
+        refs = deferred_refs(WATCH, self.cache)[:DEFERRED_RETRIES_PER_POLL]
+        if not refs or not get_scheduler().has_budget(BULK):
+            return []
+        events = []
+        for ref in refs:
+            details = self._describe(ref, retry=True)
+            if details.get("deferred"):
+                # The budget ran out again, so the rest wait for a later poll
+                break
+            if "error" not in details:
+                resolve_deferred(ref, WATCH, self.cache)
+                events.append({"event": "summarised", "ref": ref, **details})
+        return events
+
+    def _new_event(self, ref: int, status: Optional[str]) -> dict:
+        event = {"event": "new", "ref": ref, "status": status}
+        if self.summarise:
+            event.update(self._describe(ref))
+        return event
+
+    def _describe(self, ref: int, retry: bool = False) -> dict:
+        """Returns the title and summary of a referendum, or the error that prevented them"""
+        details = {}
+        try:
+            result = cached_referendum(ref, get_referendum, self.cache)
+            details["title"] = result.get("title")
+            content = result.get("content")
+            details["summary"] = (
+                cached_summary(ref, content, self._summarise, self.cache) if content else None
+            )
+        except BudgetExceeded as e:
+            # Kept for retry on a later poll; a retried referendum is already recorded
+            if not retry:
+                defer(ref, WATCH, self.cache)
+            details["error"] = str(e)
+            details["deferred"] = True
+        except Exception as e:
+            details["error"] = str(e)
+        return details
+
+    def _summarise(self, content: str):
+        return get_scheduler().call(BULK, summarise_referendum, content)
+
+    def _adapt(self, changed: bool):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * BACKOFF_FACTOR, self.max_interval)
+
+
+def post_webhook(url: str, event: dict):
+    """Delivers an event to a webhook as a JSON POST"""
+    response = httpx.post(url, json=event, timeout=10)
+    response.raise_for_status()
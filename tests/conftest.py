@@ -0,0 +1,19 @@
+import pytest
+
+from cache import CACHE_BACKEND_ENV, create_cache
+from scheduler import create_scheduler
+from snapshot import SNAPSHOT_PATH_ENV, open_snapshot
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    """Give every test an empty in-memory cache, snapshot and scheduler."""
+    monkeypatch.delenv(CACHE_BACKEND_ENV, raising=False)
+    monkeypatch.setenv(SNAPSHOT_PATH_ENV, str(tmp_path / "snapshot.bin"))
+    create_cache.cache_clear()
+    open_snapshot.cache_clear()
+    create_scheduler.cache_clear()
+    yield
+    create_cache.cache_clear()
+    open_snapshot.cache_clear()
+    create_scheduler.cache_clear()
@@ -0,0 +1,127 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from backends import (
+    CompatibleBackend,
+    ExtractiveBackend,
+    OpenAIBackend,
+    SummaryBackend,
+    create_backend,
+    extractive_summary,
+    get_backend,
+    take_usage,
+)
+from referendum import summarise_referendum
+
+
+class TestBackends:
+    """Test cases for the pluggable summary backends."""
+
+    def test_get_backend_defaults_to_openai(self, monkeypatch):
+        """Test that OpenAI is used when no backend is configured."""
+        monkeypatch.delenv("SUMMARY_BACKEND", raising=False)
+
+        backend = get_backend()
+
+        assert isinstance(backend, OpenAIBackend)
+        assert backend.model == "gpt-4.1"
+
+    def test_get_backend_from_environment(self, monkeypatch):
+        """Test backend selection through environment variables."""
+        monkeypatch.setenv("SUMMARY_BACKEND", "compatible")
+        monkeypatch.setenv("SUMMARY_BASE_URL", "http://localhost:8080/v1")
+        monkeypatch.setenv("SUMMARY_MODEL", "llama-3.1-8b-instruct")
+
+        backend = get_backend()
+
+        assert isinstance(backend, CompatibleBackend)
+        assert backend.base_url == "http://localhost:8080/v1"
+        assert backend.model == "llama-3.1-8b-instruct"
+
+    def test_create_backend_invalid_configuration(self):
+        """Test that bad configuration is reported clearly."""
+        with pytest.raises(ValueError, match="Unknown summary backend"):
+            create_backend("nope")
+        with pytest.raises(ValueError, match="SUMMARY_BASE_URL"):
+            create_backend("compatible", model="local")
+
+    @patch("openai.OpenAI")
+    def test_compatible_backend_uses_chat_completions(self, mock_openai_client):
+        """Test that the compatible backend talks to the configured base URL."""
+        mock_response = Mock()
+        mock_response.choices = [Mock(message=Mock(content="Local summary"))]
+        mock_openai_client.return_value.chat.completions.create.return_value = mock_response
+
+        backend = CompatibleBackend("http://localhost:8000/v1", "qwen2.5-7b")
+        result = backend.summarise("Referendum content")
+
+        assert result == "Local summary"
+        mock_openai_client.assert_called_once_with(
+            base_url="http://localhost:8000/v1", api_key="not-needed"
+        )
+        call_args = mock_openai_client.return_value.chat.completions.create.call_args
+        assert call_args[1]["model"] == "qwen2.5-7b"
+        assert call_args[1]["messages"][1] == {"role": "user", "content": "Referendum content"}
+
+    @patch("openai.responses.create")
+    def test_reported_usage_is_recorded(self, mock_create):
+        """Test that token usage reported by the server is kept for the scheduler."""
+        mock_create.return_value = Mock(output_text="Summary", usage=Mock(total_tokens=812))
+
+        OpenAIBackend().summarise("Referendum content")
+
+        assert take_usage() == 812
+        assert take_usage() is None
+
+    def test_extractive_summary_is_deterministic(self):
+        """Test that the extractive summary is stable and respects the word limit."""
+        content = (
+            "## Proposal\n\nThe treasury proposal funds developer tooling for parachains. "
+            "The weather was nice. Developer tooling funds support parachains and the "
+            "treasury. **Audit** costs are included in the tooling budget."
+        )
+
+        first = extractive_summary(content, max_words=20)
+        second = extractive_summary(content, max_words=20)
+
+        assert first == second
+        assert len(first.split()) <= 20
+        assert "tooling" in first
+        assert "#" not in first and "*" not in first
+
+    def test_extractive_summary_limits_unpunctuated_content(self):
+        """Test that bullet lists and long paragraphs cannot exceed the word limit."""
+        bullets = "\n".join(f"- Milestone {i} delivers tooling work" for i in range(300))
+        paragraph = "<p>" + " ".join(["tooling funds parachains"] * 300) + "</p>"
+
+        listed = extractive_summary(bullets, max_words=30)
+
+        assert len(listed.split()) <= 30
+        assert "-" not in listed
+        assert len(extractive_summary(paragraph, max_words=30).split()) == 30
+
+    def test_extractive_summary_empty_content(self):
+        """Test the extractive summary with no usable content."""
+        assert extractive_summary("") == ""
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test that a backend missing summarise fails when it is created."""
+
+        class Incomplete(SummaryBackend):
+            name = "incomplete"
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_cache_id_names_backend_and_model(self):
+        """Test that backends with different models have different cache identities."""
+        assert OpenAIBackend("gpt-4.1").cache_id == "openai/gpt-4.1"
+        assert OpenAIBackend("gpt-4.1-mini").cache_id == "openai/gpt-4.1-mini"
+        assert ExtractiveBackend().cache_id == "extractive"
+
+    def test_summarise_referendum_with_explicit_backend(self):
+        """Test that summarise_referendum accepts a backend override."""
+        result = summarise_referendum("One sentence only.", backend=ExtractiveBackend())
+
+        assert result == "One sentence only."
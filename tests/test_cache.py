@@ -0,0 +1,250 @@
+import socketserver
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from cache import (
+    CacheBackend,
+    LockTimeout,
+    MemoryCache,
+    RedisCache,
+    SQLiteCache,
+    cached_referendum,
+    cached_summary,
+    create_cache,
+    get_cache,
+)
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Minimal stand-in for a Redis server supporting GET, SET (NX/PX), DEL, INCRBY and PEXPIRE."""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while (args := self.read_command()) is not None:
+            command = args[0].upper()
+            if len(args) > 1 and args[1] in store:
+                expires = store[args[1]][1]
+                if expires and expires <= time.time():
+                    del store[args[1]]
+            if command == b"GET":
+                value = store.get(args[1])
+                reply = b"$-1\r\n" if not value else b"$%d\r\n%s\r\n" % (len(value[0]), value[0])
+            elif command == b"SET":
+                options = [a.upper() for a in args[3:]]
+                expires = None
+                if b"PX" in options:
+                    expires = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+                if b"NX" in options and args[1] in store:
+                    reply = b"$-1\r\n"
+                else:
+                    store[args[1]] = (args[2], expires)
+                    reply = b"+OK\r\n"
+            elif command == b"DEL":
+                reply = b":%d\r\n" % int(store.pop(args[1], None) is not None)
+            elif command == b"INCRBY":
+                value, expires = store.get(args[1], (b"0", None))
+                value = int(value) + int(args[2])
+                store[args[1]] = (str(value).encode(), expires)
+                reply = b":%d\r\n" % value
+            elif command == b"PEXPIRE":
+                value, _ = store[args[1]]
+                store[args[1]] = (value, time.time() + int(args[2]) / 1000)
+                reply = b":1\r\n"
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache()
+    if request.param == "sqlite":
+        return SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    return RedisCache(request.getfixturevalue("redis_url"))
+
+
+class TestCacheBackends:
+    """Test cases shared by every cache backend."""
+
+    def test_set_get_delete(self, cache):
+        """Test basic storage of JSON values."""
+        cache.set_json("referendum:1", {"title": "Référendum"})
+
+        assert cache.get_json("referendum:1") == {"title": "Référendum"}
+        cache.delete("referendum:1")
+        assert cache.get_json("referendum:1") is None
+
+    def test_values_expire(self, cache):
+        """Test that values with a TTL expire."""
+        cache.set_json("referendum:2", {"title": "Old"}, ttl=0.05)
+        time.sleep(0.1)
+
+        assert cache.get_json("referendum:2") is None
+
+    def test_incr_counts_and_expires(self, cache):
+        """Test that counters add up, go down and start again from zero once expired."""
+        assert cache.incr("tokens:a", 400, ttl=0.05) == 400
+        assert cache.incr("tokens:a", 100, ttl=0.05) == 500
+        assert cache.incr("tokens:a", -200, ttl=0.05) == 300
+        assert cache.get_json("tokens:a") == 300
+        time.sleep(0.1)
+
+        assert cache.incr("tokens:a", 7) == 7
+
+    def test_lock_is_exclusive(self, cache):
+        """Test that a held lock cannot be taken again until released."""
+        token = cache.acquire_lock("summary:1", ttl=30)
+
+        assert token is not None
+        assert cache.acquire_lock("summary:1", ttl=30) is None
+        cache.release_lock("summary:1", "someone-else")
+        assert cache.acquire_lock("summary:1", ttl=30) is None
+        cache.release_lock("summary:1", token)
+        assert cache.acquire_lock("summary:1", ttl=30) is not None
+
+    def test_expired_lock_can_be_taken(self, cache):
+        """Test that a lock left behind by a crashed worker expires."""
+        cache.acquire_lock("summary:2", ttl=0.05)
+        time.sleep(0.1)
+
+        assert cache.acquire_lock("summary:2", ttl=30) is not None
+
+    def test_lock_timeout(self, cache):
+        """Test that waiting on a held lock gives up after the timeout."""
+        cache.acquire_lock("summary:3", ttl=30)
+
+        with pytest.raises(LockTimeout):
+            with cache.lock("summary:3", timeout=0.05, poll=0.01):
+                pass
+
+
+class TestSharedCaching:
+    """Test cases for cross-worker caching of referenda and summaries."""
+
+    def test_sqlite_is_shared_between_connections(self, tmp_path):
+        """Test that separate SQLite connections see each other's values and locks."""
+        path = str(tmp_path / "shared.sqlite3")
+        first, second = SQLiteCache(path), SQLiteCache(path)
+
+        first.set_json("summary:1:abc", "Shared summary")
+        token = first.acquire_lock("summary:1", ttl=30)
+
+        assert second.get_json("summary:1:abc") == "Shared summary"
+        assert second.acquire_lock("summary:1", ttl=30) is None
+        first.release_lock("summary:1", token)
+        assert second.acquire_lock("summary:1", ttl=30) is not None
+
+    def test_sqlite_incr_is_atomic_across_connections(self, tmp_path):
+        """Test that concurrent increments from separate connections are never lost."""
+        path = str(tmp_path / "shared.sqlite3")
+        SQLiteCache(path)
+
+        def count(cache):
+            for _ in range(50):
+                cache.incr("tokens", 1)
+
+        workers = [threading.Thread(target=count, args=(SQLiteCache(path),)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert SQLiteCache(path).get_json("tokens") == 200
+
+    def test_cached_referendum_fetches_once(self):
+        """Test that referendum data is reused from the cache."""
+        fetch = Mock(return_value={"title": "Cached"})
+        cache = MemoryCache()
+
+        assert cached_referendum(7, fetch, cache) == {"title": "Cached"}
+        assert cached_referendum(7, fetch, cache) == {"title": "Cached"}
+        fetch.assert_called_once_with(7)
+
+    def test_cached_summary_single_flight(self, tmp_path):
+        """Test that concurrent workers only summarise a referendum once."""
+        path = str(tmp_path / "shared.sqlite3")
+        calls = []
+
+        def summarise(content):
+            calls.append(content)
+            time.sleep(0.1)
+            return "One summary"
+
+        results = []
+        workers = [
+            threading.Thread(
+                target=lambda: results.append(
+                    cached_summary(9, "Body", summarise, SQLiteCache(path))
+                )
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert results == ["One summary"] * 4
+        assert calls == ["Body"]
+
+    def test_cached_summary_changes_with_content(self):
+        """Test that edited content produces a new summary."""
+        cache = MemoryCache()
+        summarise = Mock(side_effect=["First", "Second"])
+
+        assert cached_summary(1, "Body", summarise, cache) == "First"
+        assert cached_summary(1, "Edited body", summarise, cache) == "Second"
+
+    def test_cached_summary_is_keyed_by_source(self):
+        """Test that summaries from different backends do not stand in for each other."""
+        cache = MemoryCache()
+        summarise = Mock(side_effect=["Model summary", "Extractive summary"])
+
+        assert cached_summary(1, "Body", summarise, cache, "openai/gpt-4.1") == "Model summary"
+        assert cached_summary(1, "Body", summarise, cache, "extractive") == "Extractive summary"
+        assert cached_summary(1, "Body", summarise, cache, "openai/gpt-4.1") == "Model summary"
+
+    def test_incomplete_cache_cannot_be_created(self):
+        """Test that a cache backend missing methods fails when it is created."""
+
+        class Incomplete(CacheBackend):
+            def get(self, key):
+                return None
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_get_cache_from_environment(self, monkeypatch, tmp_path):
+        """Test backend selection through environment variables."""
+        monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+        monkeypatch.setenv("CACHE_PATH", str(tmp_path / "env.sqlite3"))
+
+        assert isinstance(get_cache(), SQLiteCache)
+        with pytest.raises(ValueError, match="Unknown cache backend"):
+            create_cache("memcached")
@@ -0,0 +1,118 @@
+from unittest.mock import Mock, patch
+
+import comments
+from cache import get_cache
+from comments import CommentDigest, build_summary_input, get_comment_digest, iter_comments
+from src.main import handle_display_ai_summary
+
+
+def make_comments(count: int, offset: int = 0) -> list:
+    return [
+        {
+            "content": f"**Comment** {offset + i}",
+            "username": f"user{(offset + i) % 3}",
+            "comment_reactions": {"👍": {"count": offset + i}, "👎": {"count": 0}},
+            "replies": [{"content": "reply"}] if i == 0 else [],
+        }
+        for i in range(count)
+    ]
+
+
+def mock_client_for(all_comments: list):
+    """Returns a patched httpx.Client serving all_comments in pages."""
+    requested_pages = []
+
+    def get(url, params, headers):
+        page, size = params["page"], params["listingLimit"]
+        requested_pages.append(page)
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"comments": all_comments[(page - 1) * size : page * size]}
+        return response
+
+    client = Mock()
+    client.get.side_effect = get
+    return client, requested_pages
+
+
+class TestComments:
+    """Test cases for comment streaming and digests."""
+
+    @patch("comments.httpx.Client")
+    def test_iter_comments_streams_all_pages(self, mock_client):
+        """Test that comments are streamed in order across pages."""
+        client, requested_pages = mock_client_for(make_comments(12))
+        mock_client.return_value.__enter__.return_value = client
+
+        result = list(iter_comments(1, page_size=5, prefetch=2))
+
+        assert [c["content"] for c in result] == [f"**Comment** {i}" for i in range(12)]
+        assert 1 in requested_pages and 3 in requested_pages
+
+    @patch("comments.httpx.Client")
+    def test_iter_comments_resumes_from_offset(self, mock_client):
+        """Test that streaming can start part way through a page."""
+        client, requested_pages = mock_client_for(make_comments(12))
+        mock_client.return_value.__enter__.return_value = client
+
+        result = list(iter_comments(1, start=7, page_size=5, prefetch=1))
+
+        assert [c["content"] for c in result] == [f"**Comment** {i}" for i in range(7, 12)]
+        assert requested_pages == [2, 3]
+
+    @patch("comments.httpx.Client")
+    def test_get_comment_digest_is_incremental(self, mock_client):
+        """Test that a second digest only folds in comments added since the first."""
+        thread = make_comments(4)
+        client, _ = mock_client_for(thread)
+        mock_client.return_value.__enter__.return_value = client
+
+        digest = get_comment_digest(42)
+        assert digest.seen == 4
+
+        thread.extend(make_comments(2, offset=4))
+        with patch("comments.iter_comments", wraps=iter_comments) as spy:
+            digest = get_comment_digest(42)
+
+        spy.assert_called_once_with(42, start=4)
+        assert get_cache().get_json("comments:42")["seen"] == 6
+        assert digest.seen == 6
+        assert digest.replies == 2
+        assert len(digest.participants) == 3
+
+    def test_digest_keeps_most_reacted_comments(self):
+        """Test that the digest stays bounded and renders the top comments."""
+        digest = CommentDigest(1)
+        for comment in make_comments(20):
+            digest.add(comment)
+
+        rendered = digest.render()
+
+        assert len(digest.top_comments) == comments.DIGEST_TOP_COMMENTS
+        assert "Comments: 20 from 3 participants, 1 replies." in rendered
+        assert "(19 reactions) Comment 19" in rendered
+        assert "Comment 10" not in rendered
+        assert CommentDigest.from_dict(digest.to_dict()).render() == rendered
+
+    def test_build_summary_input_without_comments(self):
+        """Test that content is unchanged when there is no discussion."""
+        assert build_summary_input("Body", CommentDigest(1)) == "Body"
+
+    @patch("src.main.summarise_referendum")
+    @patch("src.main.get_comment_digest")
+    @patch("src.main.get_referendum")
+    def test_ai_summary_includes_comment_digest(
+        self, mock_get_referendum, mock_get_digest, mock_summarise
+    ):
+        """Test that the AI summary prompt includes the discussion digest."""
+        digest = CommentDigest(5)
+        digest.add(make_comments(1)[0])
+        mock_get_referendum.return_value = {"content": "Body", "comments_count": 1}
+        mock_get_digest.return_value = digest
+        mock_summarise.return_value = "Summary"
+
+        handle_display_ai_summary(5)
+
+        prompt = mock_summarise.call_args[0][0]
+        assert prompt.startswith("Body\n\nCommunity discussion digest:")
+        assert "Comment 0" in prompt
@@ -0,0 +1,136 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+import deadline
+from cache import MemoryCache, cached_summary
+from deadline import summarise_with_deadline
+from src.main import handle_display_ai_summary
+
+CONTENT = "The treasury funds tooling. The tooling helps parachains. Weather is nice."
+
+
+@pytest.fixture(autouse=True)
+def reset_paths():
+    deadline.SUMMARY_PATHS.clear()
+
+
+@pytest.fixture
+def slow_model():
+    """A summariser that blocks until released."""
+    release = threading.Event()
+
+    def summarise(content):
+        release.wait(5)
+        return "Full model summary"
+
+    yield summarise, release
+    release.set()
+
+
+class TestDeadline:
+    """Test cases for deadline-aware summarisation."""
+
+    def test_model_answers_in_time(self):
+        """Test that a fast model result is returned directly."""
+        result = summarise_with_deadline(1, CONTENT, Mock(return_value="Model"), 5, MemoryCache())
+
+        assert (result.summary, result.path, result.is_fallback) == ("Model", "model", False)
+        assert deadline.SUMMARY_PATHS == {"model": 1}
+
+    def test_cached_summary_skips_model(self):
+        """Test that an existing summary of the same content is reused."""
+        cache = MemoryCache()
+        cached_summary(1, CONTENT, Mock(return_value="Earlier"), cache)
+        summarise = Mock()
+
+        result = summarise_with_deadline(1, CONTENT, summarise, 0.01, cache)
+
+        assert (result.summary, result.path) == ("Earlier", "cached")
+        summarise.assert_not_called()
+
+    def test_extractive_fallback_then_full_result(self, slow_model):
+        """Test the extractive fallback and that the full summary is cached later."""
+        summarise, release = slow_model
+        cache = MemoryCache()
+
+        result = summarise_with_deadline(2, CONTENT, summarise, 0.05, cache)
+
+        assert result.path == "extractive"
+        assert "tooling" in result.summary
+        release.set()
+        assert result.pending.result(timeout=5) == "Full model summary"
+        later = summarise_with_deadline(2, CONTENT, summarise, 0.05, cache)
+        assert (later.summary, later.path) == ("Full model summary", "cached")
+        assert deadline.SUMMARY_PATHS == {"extractive": 1, "cached": 1}
+
+    def test_previous_summary_fallback(self, slow_model):
+        """Test that a summary of an earlier version of the content is preferred."""
+        summarise, _ = slow_model
+        cache = MemoryCache()
+        cached_summary(3, "Old content", Mock(return_value="Old summary"), cache)
+
+        result = summarise_with_deadline(3, CONTENT, summarise, 0.05, cache)
+
+        assert (result.summary, result.path) == ("Old summary", "previous")
+
+    def test_model_error_falls_back(self):
+        """Test that a model failure before the deadline still returns a quick summary."""
+        summarise = Mock(side_effect=RuntimeError("rate limited"))
+
+        result = summarise_with_deadline(5, CONTENT, summarise, 5, MemoryCache())
+
+        assert result.path == "extractive"
+        assert str(result.error) == "rate limited"
+        assert result.pending is None
+
+    def test_abandoned_calls_do_not_block_exit(self, slow_model):
+        """Test that model calls left running after the deadline are on daemon threads."""
+        summarise, _ = slow_model
+
+        summarise_with_deadline(6, CONTENT, summarise, 0.01, MemoryCache())
+
+        running = [t for t in threading.enumerate() if t.name == "summary"]
+        assert running and all(t.daemon for t in running)
+
+    @patch("src.main.get_comment_digest")
+    @patch("src.main.summarise_referendum")
+    @patch("src.main.get_referendum")
+    def test_handler_deadline_includes_fetching(
+        self, mock_get_referendum, mock_summarise, mock_digest, capsys, slow_model
+    ):
+        """Test that time spent fetching counts against the deadline and skips comments."""
+
+        def slow_fetch(ref):
+            time.sleep(0.1)
+            return {"content": CONTENT, "comments_count": 3}
+
+        mock_get_referendum.side_effect = slow_fetch
+        mock_summarise.side_effect = slow_model[0]
+        started = time.monotonic()
+
+        handle_display_ai_summary(7, deadline=0.1)
+
+        assert time.monotonic() - started < 1
+        mock_digest.assert_not_called()
+        out = capsys.readouterr().out
+        assert "summarising without them" in out
+        assert "Quick extractive summary shown" in out
+
+    @patch("src.main.summarise_referendum")
+    @patch("src.main.get_referendum")
+    def test_handler_reports_fallback(
+        self, mock_get_referendum, mock_summarise, capsys, slow_model
+    ):
+        """Test that the CLI shows the quick summary and says the full one is coming."""
+        mock_summarise.side_effect = slow_model[0]
+        mock_get_referendum.return_value = {"content": CONTENT}
+
+        handle_display_ai_summary(4, deadline=0.05)
+
+        captured = capsys.readouterr()
+        assert "tooling" in captured.out
+        assert "Quick extractive summary shown" in captured.out
+        assert "Summary generated successfully" not in captured.out
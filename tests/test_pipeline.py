@@ -0,0 +1,117 @@
+import json
+from unittest.mock import Mock, patch
+
+from typer.testing import CliRunner
+
+from backends import ExtractiveBackend
+from cache import MemoryCache
+from pipeline import Pipeline, normalise_content, parse_payload
+from scheduler import BATCH, SummaryScheduler, deferred_refs
+from src.main import app
+from watch import Watcher
+
+
+def make_payload(ref: int) -> bytes:
+    return json.dumps(
+        {
+            "title": f"Referendum {ref}",
+            "status": "Deciding",
+            "content": f"## Proposal {ref}\n\n\n**Fund**   the   tooling.  ",
+            "tags": ["treasury"],
+            "comments_count": ref,
+            "comments": [{"content": "unused"}] * 10,
+        }
+    ).encode()
+
+
+async def fake_payload(client, ref_id):
+    if ref_id == 13:
+        raise RuntimeError("boom")
+    return make_payload(ref_id)
+
+
+class TestPipeline:
+    """Test cases for the batch processing pipeline."""
+
+    def test_normalise_content(self):
+        """Test markup removal and whitespace collapsing."""
+        assert normalise_content("# Title\n\n\n\n**Bold**   text  ") == "Title\n\nBold text"
+
+    def test_parse_payload_keeps_required_fields(self):
+        """Test that parsing drops unused fields and cleans content."""
+        record = parse_payload(make_payload(7))
+
+        assert set(record) == {"title", "status", "content", "tags", "comments_count"}
+        assert record["content"] == "Proposal 7\n\nFund the tooling."
+
+    @patch("pipeline.get_referendum_payload", side_effect=fake_payload)
+    def test_run_processes_all_refs(self, mock_payload):
+        """Test that every ref flows through all stages, with failures recorded."""
+        pipeline = Pipeline(workers=2, queue_size=2, backend=ExtractiveBackend())
+
+        results = pipeline.run(range(10, 16))
+
+        assert sorted(r["ref"] for r in results) == list(range(10, 16))
+        failed = [r for r in results if "error" in r]
+        assert failed == [{"ref": 13, "error": "fetch: boom"}]
+        ok = next(r for r in results if r["ref"] == 10)
+        assert ok["summary"] == "Proposal 10 Fund the tooling."
+
+        metrics = {m["stage"]: m for m in pipeline.metrics_snapshot()}
+        assert metrics["fetch"]["processed"] == 5
+        assert metrics["fetch"]["failed"] == 1
+        assert metrics["parse"]["processed"] == 5
+        # Bounded queues never hold more than queue_size items
+        assert all(m["peak_queue_depth"] <= 2 for m in metrics.values())
+
+    @patch("watch.get_referendum")
+    @patch("pipeline.get_referendum_payload", side_effect=fake_payload)
+    def test_batch_shares_fetches_and_summaries(self, mock_payload, mock_get_referendum):
+        """Test that watch mode reuses what a batch run fetched and summarised."""
+        cache = MemoryCache()
+        summarise = Mock(return_value="Shared summary")
+
+        with patch("pipeline.summarise_referendum", summarise):
+            Pipeline(workers=1, cache=cache, scheduler=SummaryScheduler(cache=cache)).run([6])
+        with patch("watch.summarise_referendum", summarise):
+            details = Watcher(cache=cache)._describe(6)
+
+        assert details == {"title": "Referendum 6", "summary": "Shared summary"}
+        summarise.assert_called_once()
+        mock_get_referendum.assert_not_called()
+        mock_payload.assert_called_once()
+
+    @patch("pipeline.get_referendum_payload", side_effect=fake_payload)
+    def test_over_budget_summaries_are_deferred_to_a_later_run(self, mock_payload):
+        """Test that summaries turned away by the budget are retried by the next run."""
+        cache = MemoryCache()
+        broke = SummaryScheduler(daily_tokens=1, cache=cache)
+
+        first = Pipeline(workers=1, backend=ExtractiveBackend(), cache=cache, scheduler=broke)
+        results = first.run([10, 11])
+
+        assert all("budget" in r["error"] for r in results)
+        assert sorted(deferred_refs(BATCH, cache)) == [10, 11]
+
+        funded = SummaryScheduler(cache=cache)
+        later = Pipeline(workers=1, backend=ExtractiveBackend(), cache=cache, scheduler=funded)
+        results = later.run([10])
+
+        assert results[0]["summary"] == "Proposal 10 Fund the tooling."
+        assert deferred_refs(BATCH, cache) == [11]
+
+    @patch("pipeline.get_referendum_payload", side_effect=fake_payload)
+    def test_batch_command_writes_ndjson(self, mock_payload):
+        """Test that the batch command prints one JSON record per line."""
+        runner = CliRunner()
+
+        result = runner.invoke(
+            app, ["batch", "--start", "1", "--end", "3", "--workers", "1", "--no-summarise"]
+        )
+
+        assert result.exit_code == 0
+        lines = [
+            json.loads(line) for line in result.stdout.splitlines() if line.startswith('{"ref"')
+        ]
+        assert sorted(r["ref"] for r in lines) == [1, 2, 3]
+        assert all(r["summary"] is None for r in lines)
@@ -1,9 +1,10 @@
+import json
 from unittest.mock import Mock, patch
 
 import httpx
 import pytest
 
-from referendum import get_referendum, summarise_referendum
+from referendum import decode_referendum, get_referendum, summarise_referendum
 
 
 class TestReferendums:
@@ -23,7 +24,9 @@ class TestReferendums:
 
         # Setup mock
         mock_response = Mock()
-        mock_response.json.return_value = expected_data
+        mock_response.content = json.dumps(
+            {**expected_data, "comments": [{"content": "Unused"}], "timeline": []}
+        ).encode()
         mock_response.raise_for_status.return_value = None
 
         mock_client_instance = Mock()
@@ -37,7 +40,7 @@ class TestReferendums:
         # Assertions
         assert result == expected_data
         mock_client.assert_called_once_with(
-            base_url="https://api.polkassembly.io/api/v1", timeout=None
+            base_url="https://api.polkassembly.io/api/v1", timeout=10
         )
         mock_client_instance.get.assert_called_once_with(
             "/posts/on-chain-post",
@@ -63,7 +66,28 @@ class TestReferendums:
         with pytest.raises(httpx.HTTPStatusError):
             get_referendum(999)
 
-    @patch("src.referendum.openai.responses.create")
+    def test_decode_referendum_projects_fields(self):
+        """Test that decoding keeps only the fields the CLI uses."""
+        payload = json.dumps(
+            {
+                "title": "Test Referendum",
+                "status": "voting",
+                "comments": [{"content": "A comment"}] * 100,
+                "post_reactions": {"like": {"count": 3}},
+            }
+        ).encode()
+
+        assert decode_referendum(payload) == {"title": "Test Referendum", "status": "voting"}
+        assert "comments" in decode_referendum(payload, fields=None)
+
+    @patch("referendum.orjson", None)
+    def test_decode_referendum_without_orjson(self):
+        """Test the standard library fallback when orjson is unavailable."""
+        payload = b'{"title": "Fallback", "content": "Body", "reactions": []}'
+
+        assert decode_referendum(payload) == {"title": "Fallback", "content": "Body"}
+
+    @patch("openai.responses.create")
     def test_summarise_referendum_success(self, mock_openai):
         """Test successful referendum summarization."""
         # Mock OpenAI response
@@ -88,7 +112,7 @@ class TestReferendums:
         assert call_args[1]["input"][1]["role"] == "user"
         assert call_args[1]["input"][1]["content"] == test_content
 
-    @patch("src.referendum.openai.responses.create")
+    @patch("openai.responses.create")
     def test_summarise_referendum_empty_content(self, mock_openai):
         """Test referendum summarization with empty content."""
         mock_response = Mock()
@@ -100,7 +124,7 @@ class TestReferendums:
         assert result == "No content provided for summarization."
         mock_openai.assert_called_once()
 
-    @patch("src.referendum.openai.responses.create")
+    @patch("openai.responses.create")
     def test_summarise_referendum_openai_error(self, mock_openai):
         """Test referendum summarization with OpenAI API error."""
         # Setup mock to raise an exception
@@ -133,6 +157,6 @@ def sample_referendum_data():
 def mock_referendum_response(sample_referendum_data):
     """Mock HTTP response for referendum data."""
     mock_response = Mock()
-    mock_response.json.return_value = sample_referendum_data
+    mock_response.content = json.dumps(sample_referendum_data).encode()
     mock_response.raise_for_status.return_value = None
     return mock_response
@@ -0,0 +1,198 @@
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from backends import record_usage
+from cache import MemoryCache, SQLiteCache
+from scheduler import (
+    BULK,
+    INTERACTIVE,
+    OVERHEAD_TOKENS,
+    BudgetExceeded,
+    SummaryScheduler,
+    estimate_tokens,
+)
+from src.main import handle_display_ai_summary
+
+
+def recorder(order: list, gate: threading.Event = None, started: threading.Event = None):
+    """Returns a summariser that records its input, optionally waiting on gate first."""
+
+    def summarise(content):
+        if started is not None:
+            started.set()
+        if gate is not None:
+            gate.wait(5)
+        order.append(content)
+        return f"summary of {content}"
+
+    return summarise
+
+
+class TestScheduler:
+    """Test cases for the summary scheduler."""
+
+    def test_interactive_jumps_the_bulk_queue(self):
+        """Test that an interactive job runs before bulk jobs queued ahead of it."""
+        scheduler = SummaryScheduler(concurrency=1)
+        order, gate, started = [], threading.Event(), threading.Event()
+        blocker = scheduler.submit(BULK, recorder(order, gate, started), "bulk-0")
+        started.wait(5)
+        bulk = [scheduler.submit(BULK, recorder(order), f"bulk-{i}") for i in range(1, 4)]
+        interactive = scheduler.submit(INTERACTIVE, recorder(order), "interactive")
+
+        gate.set()
+        for future in [blocker, interactive, *bulk]:
+            future.result(timeout=5)
+
+        assert order[:2] == ["bulk-0", "interactive"]
+        assert interactive.result() == "summary of interactive"
+
+    def test_weighted_fair_share(self):
+        """Test that busy lanes share dispatches by weight, so bulk is never starved."""
+        scheduler = SummaryScheduler(concurrency=1, weights={INTERACTIVE: 2, BULK: 1})
+        order, gate, started = [], threading.Event(), threading.Event()
+        futures = [scheduler.submit(INTERACTIVE, recorder(order, gate, started), "gate")]
+        started.wait(5)
+        futures += [scheduler.submit(BULK, recorder(order), "b") for _ in range(3)]
+        futures += [scheduler.submit(INTERACTIVE, recorder(order), "i") for _ in range(6)]
+
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        # While both lanes are waiting, interactive gets two dispatches for each bulk one
+        assert "".join(order[1:7]).count("i") == 4
+
+    def test_lane_concurrency_cap(self):
+        """Test that a lane never runs more jobs than its cap."""
+        scheduler = SummaryScheduler(concurrency=4, lane_caps={BULK: 1})
+        order, gate = [], threading.Event()
+        futures = [scheduler.submit(BULK, recorder(order, gate), str(i)) for i in range(3)]
+
+        lanes = {lane["lane"]: lane for lane in scheduler.metrics()["lanes"]}
+        assert lanes[BULK]["running"] <= 1
+        assert lanes[BULK]["queued"] >= 2
+
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+        lanes = {lane["lane"]: lane for lane in scheduler.metrics()["lanes"]}
+        assert lanes[BULK]["completed"] == 3
+        assert lanes[BULK]["wait_max_ms"] > 0
+
+    def test_daily_budget_defers_bulk_and_drops_interactive(self):
+        """Test that bulk jobs cannot spend the interactive reserve of the budget."""
+        cost = estimate_tokens("x")
+        assert cost == OVERHEAD_TOKENS
+        scheduler = SummaryScheduler(concurrency=1, daily_tokens=cost * 3, interactive_reserve=0.4)
+        order = []
+
+        assert scheduler.call(BULK, recorder(order), "x") == "summary of x"
+        with pytest.raises(BudgetExceeded):
+            scheduler.call(BULK, recorder(order), "x")
+        scheduler.call(INTERACTIVE, recorder(order), "x")
+        scheduler.call(INTERACTIVE, recorder(order), "x")
+        with pytest.raises(BudgetExceeded):
+            scheduler.call(INTERACTIVE, recorder(order), "x")
+
+        metrics = scheduler.metrics()
+        lanes = {lane["lane"]: lane for lane in metrics["lanes"]}
+        assert metrics["tokens_used"] == cost * 3
+        assert lanes[BULK]["deferred"] == 1
+        assert lanes[INTERACTIVE]["dropped"] == 1
+        assert len(order) == 3
+
+    def test_budget_is_shared_between_processes(self, tmp_path):
+        """Test that schedulers sharing a cache draw on one daily budget."""
+        path = str(tmp_path / "shared.sqlite3")
+        cost = estimate_tokens("x")
+        cli = SummaryScheduler(daily_tokens=cost * 2, cache=SQLiteCache(path))
+        batch = SummaryScheduler(daily_tokens=cost * 2, cache=SQLiteCache(path))
+
+        cli.call(INTERACTIVE, recorder([]), "x")
+        batch.call(INTERACTIVE, recorder([]), "x")
+        with pytest.raises(BudgetExceeded):
+            cli.call(INTERACTIVE, recorder([]), "x")
+
+        assert cli.metrics()["tokens_used"] == batch.metrics()["tokens_used"] == cost * 2
+
+    def test_lane_cap_is_shared_between_processes(self):
+        """Test that a lane's cap counts jobs running in every scheduler on the cache."""
+        cache = MemoryCache()
+        first = SummaryScheduler(lane_caps={BULK: 1}, cache=cache)
+        second = SummaryScheduler(lane_caps={BULK: 1}, cache=cache)
+        order, gate, started = [], threading.Event(), threading.Event()
+        blocker = first.submit(BULK, recorder(order, gate), "first")
+        waiting = second.submit(BULK, recorder(order, started=started), "second")
+
+        assert not started.wait(0.3)
+        gate.set()
+        blocker.result(timeout=5)
+        waiting.result(timeout=5)
+
+        assert order == ["first", "second"]
+
+    def test_slow_lease_does_not_hold_up_submit(self):
+        """Test that jobs can be queued while a worker waits on the cache for a lease."""
+        cache = MemoryCache()
+        scheduler = SummaryScheduler(concurrency=1, cache=cache)
+        gate, leasing = threading.Event(), threading.Event()
+        acquire_lock = cache.acquire_lock
+
+        def slow_acquire_lock(name, ttl):
+            leasing.set()
+            gate.wait(5)
+            return acquire_lock(name, ttl)
+
+        cache.acquire_lock = slow_acquire_lock
+        first = scheduler.submit(BULK, recorder([]), "first")
+        leasing.wait(5)
+        submitter = threading.Thread(
+            target=scheduler.submit, args=(INTERACTIVE, recorder([]), "second")
+        )
+        submitter.start()
+        submitter.join(1)
+
+        assert not submitter.is_alive()
+        gate.set()
+        assert first.result(timeout=5) == "summary of first"
+
+    def test_reported_usage_replaces_estimate(self):
+        """Test that the budget is charged what the backend reports using."""
+        scheduler = SummaryScheduler(cache=MemoryCache())
+
+        def summarise(content):
+            record_usage(Mock(usage=Mock(total_tokens=1234)))
+            return "summary"
+
+        scheduler.call(BULK, summarise, "x")
+
+        assert scheduler.metrics()["tokens_used"] == 1234
+
+    def test_failures_are_reported(self):
+        """Test that summariser errors reach the caller and are counted."""
+        scheduler = SummaryScheduler(concurrency=1)
+
+        def fail(content):
+            raise RuntimeError("quota")
+
+        with pytest.raises(RuntimeError, match="quota"):
+            scheduler.call(INTERACTIVE, fail, "x")
+        assert scheduler.metrics()["lanes"][0]["failed"] == 1
+
+    @patch("src.main.summarise_referendum")
+    @patch("src.main.get_referendum")
+    def test_handler_reports_exhausted_budget(
+        self, mock_get_referendum, mock_summarise, capsys, monkeypatch
+    ):
+        """Test that the CLI explains when the daily budget is used up."""
+        monkeypatch.setenv("SUMMARY_DAILY_TOKENS", "10")
+        mock_get_referendum.return_value = {"content": "Body"}
+
+        result = handle_display_ai_summary(1)
+
+        assert result is False
+        assert "Daily token budget of 10 exhausted" in capsys.readouterr().out
+        mock_summarise.assert_not_called()
@@ -0,0 +1,147 @@
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from backends import get_backend
+from cache import get_cache, latest_summary_key
+from snapshot import Snapshot, get_snapshot
+from src.main import app, handle_display_metadata, refresh_in_background
+
+
+class TestSnapshot:
+    """Test cases for the warm-start snapshot."""
+
+    def test_round_trip_and_lazy_decoding(self, tmp_path):
+        """Test that records persist and are only decoded when requested."""
+        path = str(tmp_path / "snapshot.bin")
+        writer = Snapshot(path)
+        writer.update(1, referendum={"title": "First"})
+        writer.update(2, referendum={"title": "Second"}, summary="Summary two")
+        writer.update(1, summary="Summary one")
+
+        reader = Snapshot(path)
+        second = reader.get(2)
+
+        assert second["referendum"] == {"title": "Second"}
+        assert second["summary"] == "Summary two"
+        assert list(reader._records) == ["2"]
+        assert reader.get(1)["referendum"] == {"title": "First"}
+        assert reader.get(1)["summary"] == "Summary one"
+        assert reader.get(3) is None
+
+    def test_concurrent_sessions_keep_each_others_entries(self, tmp_path):
+        """Test that a session saving from a stale index does not drop newer entries."""
+        path = str(tmp_path / "snapshot.bin")
+        first, second = Snapshot(path), Snapshot(path)
+        first.get(1)
+        second.get(1)
+
+        first.update(1, referendum={"title": "From first"})
+        second.update(2, referendum={"title": "From second"})
+
+        reader = Snapshot(path)
+        assert reader.get(1)["referendum"] == {"title": "From first"}
+        assert reader.get(2)["referendum"] == {"title": "From second"}
+
+    def test_damaged_record_is_a_cold_start(self, tmp_path):
+        """Test that a truncated snapshot neither crashes reads nor survives the next save."""
+        path = tmp_path / "snapshot.bin"
+        Snapshot(str(path)).update(1, referendum={"title": "Damaged"})
+        path.write_bytes(path.read_bytes()[:-5])
+
+        snapshot = Snapshot(str(path))
+        assert snapshot.get(1) is None
+        snapshot.update(2, referendum={"title": "Fresh"})
+
+        reader = Snapshot(str(path))
+        assert reader.get(1) is None
+        assert reader.get(2)["referendum"] == {"title": "Fresh"}
+        assert list(reader._index) == ["2"]
+
+    def test_keeps_most_recently_viewed(self, tmp_path):
+        """Test that the snapshot is bounded to its size."""
+        snapshot = Snapshot(str(tmp_path / "snapshot.bin"), size=2)
+        for ref in (1, 2, 3):
+            snapshot.update(ref, referendum={"title": str(ref)})
+
+        reader = Snapshot(snapshot.path)
+        assert reader.get(1) is None
+        assert reader.get(3)["referendum"] == {"title": "3"}
+
+    def test_damaged_snapshot_is_a_cold_start(self, tmp_path):
+        """Test that an unreadable snapshot is ignored and then replaced."""
+        path = tmp_path / "snapshot.bin"
+        path.write_bytes(b"not a snapshot")
+        snapshot = Snapshot(str(path))
+
+        assert snapshot.get(1) is None
+        snapshot.update(1, referendum={"title": "Fresh"})
+        assert Snapshot(str(path)).get(1)["referendum"] == {"title": "Fresh"}
+
+    @patch("src.main.get_referendum")
+    def test_metadata_served_from_snapshot_then_refreshed(self, mock_get_referendum, capsys):
+        """Test stale-while-revalidate display of metadata."""
+        get_snapshot().update(5, referendum={"title": "Saved title", "status": "Deciding"})
+        mock_get_referendum.return_value = {"title": "Fresh title", "status": "Confirmed"}
+
+        with patch("src.main.refresh_in_background") as mock_refresh:
+            handle_display_metadata(5)
+        captured = capsys.readouterr()
+        assert "Title: Saved title" in captured.out
+        assert "refreshing in the background" in captured.out
+        mock_refresh.assert_called_once_with(5)
+        mock_get_referendum.assert_not_called()
+
+    @patch("src.main.get_referendum")
+    def test_background_refresh_updates_snapshot(self, mock_get_referendum, capsys):
+        """Test that the background refresh updates the cache and snapshot."""
+        get_snapshot().update(6, referendum={"title": "Saved title"})
+        mock_get_referendum.return_value = {"title": "Fresh title"}
+
+        refresh_in_background(6).join(timeout=5)
+        handle_display_metadata(6)
+
+        assert get_snapshot().get(6)["referendum"] == {"title": "Fresh title"}
+        assert "Title: Fresh title" in capsys.readouterr().out
+
+    @patch("src.main.refresh_in_background")
+    @patch("src.main.prompt")
+    def test_startup_renders_snapshot_first(self, mock_prompt, mock_refresh):
+        """Test that a warm start shows saved metadata before the menu."""
+        get_snapshot().update(
+            7,
+            referendum={"title": "Warm title"},
+            summary="Old summary",
+            source=get_backend().cache_id,
+        )
+        mock_prompt.return_value = {"choice": "Exit"}
+
+        result = CliRunner().invoke(app, ["referendum", "--ref", "7"])
+
+        assert result.exit_code == 0
+        assert "Title: Warm title" in result.stdout
+        assert get_cache().get_json(latest_summary_key(7, get_backend().cache_id)) == "Old summary"
+
+    @patch("src.main.refresh_in_background")
+    @patch("src.main.prompt")
+    def test_startup_keeps_newer_cached_summary(self, mock_prompt, mock_refresh):
+        """Test that a warm start does not replace a summary already in the cache."""
+        source = get_backend().cache_id
+        get_snapshot().update(8, referendum={"title": "Warm"}, summary="Old", source=source)
+        get_cache().set_json(latest_summary_key(8, source), "Newer")
+        mock_prompt.return_value = {"choice": "Exit"}
+
+        CliRunner().invoke(app, ["referendum", "--ref", "8"])
+
+        assert get_cache().get_json(latest_summary_key(8, source)) == "Newer"
+
+    @patch("src.main.refresh_in_background")
+    @patch("src.main.prompt")
+    def test_startup_ignores_summary_from_other_backend(self, mock_prompt, mock_refresh):
+        """Test that a saved summary from another backend is not offered as a fallback."""
+        get_snapshot().update(9, referendum={"title": "Warm"}, summary="Old", source="extractive")
+        mock_prompt.return_value = {"choice": "Exit"}
+
+        CliRunner().invoke(app, ["referendum", "--ref", "9"])
+
+        assert get_cache().get(latest_summary_key(9, get_backend().cache_id)) is None
@@ -0,0 +1,226 @@
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from typer.testing import CliRunner
+
+from cache import MemoryCache
+from scheduler import BATCH, WATCH, BudgetExceeded, defer, deferred_refs
+from src.main import app
+from watch import Watcher, get_referendum_listing
+
+
+def listing_response(posts: list, status_code: int = 200, etag: str = '"v1"'):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = {"ETag": etag}
+    response.json.return_value = {"count": len(posts), "posts": posts}
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestWatch:
+    """Test cases for the referendum watcher."""
+
+    def test_listing_uses_conditional_request(self):
+        """Test that a known ETag is sent and a 304 reports no change."""
+        client = Mock()
+        client.get.return_value = listing_response([], status_code=304)
+
+        posts, etag = get_referendum_listing(client, etag='"v1"')
+
+        assert posts is None
+        assert etag == '"v1"'
+        assert client.get.call_args[1]["headers"]["If-None-Match"] == '"v1"'
+
+    @patch("watch.cached_summary", return_value="New summary")
+    @patch("watch.cached_referendum", return_value={"title": "New", "content": "Body"})
+    def test_poll_reports_new_and_changed_referenda(self, mock_referendum, mock_summary):
+        """Test that only new referenda are summarised and status changes are reported."""
+        client = Mock()
+        client.get.side_effect = [
+            listing_response([{"post_id": 1, "status": "Submitted"}]),
+            listing_response(
+                [{"post_id": 2, "status": "Submitted"}, {"post_id": 1, "status": "Deciding"}],
+                etag='"v2"',
+            ),
+        ]
+        watcher = Watcher(summarise=True, cache=MemoryCache())
+
+        assert watcher.poll_once(client) == []
+        events = watcher.poll_once(client)
+
+        assert events == [
+            {
+                "event": "new",
+                "ref": 2,
+                "status": "Submitted",
+                "title": "New",
+                "summary": "New summary",
+            },
+            {
+                "event": "status_changed",
+                "ref": 1,
+                "status": "Deciding",
+                "previous_status": "Submitted",
+            },
+        ]
+        mock_referendum.assert_called_once()
+        assert watcher.etag == '"v2"'
+
+    @patch("watch.cached_referendum", return_value={"title": "New", "content": "Body"})
+    def test_over_budget_summaries_are_retried(self, mock_referendum):
+        """Test that a summary deferred by the budget is produced on a later poll."""
+        cache = MemoryCache()
+        watcher = Watcher(summarise=True, cache=cache)
+
+        with patch("watch.cached_summary", side_effect=BudgetExceeded("budget exhausted")):
+            event = watcher._new_event(5, "Submitted")
+            assert watcher.retry_deferred() == []
+        assert event["deferred"] is True
+        assert deferred_refs(WATCH, cache) == [5]
+
+        with patch("watch.cached_summary", return_value="Late summary"):
+            events = watcher.retry_deferred()
+
+        assert events == [
+            {"event": "summarised", "ref": 5, "title": "New", "summary": "Late summary"}
+        ]
+        assert deferred_refs(WATCH, cache) == []
+
+    @patch("watch.cached_summary", return_value="Late summary")
+    @patch("watch.cached_referendum", return_value={"title": "New", "content": "Body"})
+    def test_deferred_retries_are_limited(self, mock_referendum, mock_summary):
+        """Test that each poll retries a few of watch's deferrals and none of batch's."""
+        cache = MemoryCache()
+        for ref in range(1, 9):
+            defer(ref, WATCH, cache)
+        defer(100, BATCH, cache)
+        watcher = Watcher(summarise=True, cache=cache)
+
+        events = watcher.retry_deferred()
+
+        assert [event["ref"] for event in events] == [1, 2, 3, 4, 5]
+        assert deferred_refs(WATCH, cache) == [6, 7, 8]
+        assert deferred_refs(BATCH, cache) == [100]
+
+    @patch("watch.cached_referendum")
+    def test_deferred_retries_wait_for_budget(self, mock_referendum, monkeypatch):
+        """Test that nothing is fetched for a retry while the bulk budget is exhausted."""
+        monkeypatch.setenv("SUMMARY_DAILY_TOKENS", "1")
+        cache = MemoryCache()
+        defer(5, WATCH, cache)
+        watcher = Watcher(summarise=True, cache=cache)
+
+        assert watcher.retry_deferred() == []
+        mock_referendum.assert_not_called()
+        assert deferred_refs(WATCH, cache) == [5]
+
+    def test_state_survives_restart(self):
+        """Test that a new watcher resumes from the stored listing."""
+        cache = MemoryCache()
+        client = Mock()
+        client.get.return_value = listing_response([{"post_id": 1, "status": "Submitted"}])
+        Watcher(summarise=False, cache=cache).poll_once(client)
+
+        restarted = Watcher(summarise=False, cache=cache)
+        client.get.return_value = listing_response([{"post_id": 1, "status": "Confirmed"}])
+
+        assert restarted.poll_once(client)[0]["event"] == "status_changed"
+        assert client.get.call_args[1]["headers"]["If-None-Match"] == '"v1"'
+
+    def test_interval_adapts_to_activity(self):
+        """Test that polling backs off while idle and speeds up on changes."""
+        watcher = Watcher(interval=60, min_interval=30, max_interval=100, cache=MemoryCache())
+        client = Mock()
+        client.get.return_value = listing_response([], status_code=304)
+
+        watcher.poll_once(client)
+        assert watcher.interval == 90
+        watcher.poll_once(client)
+        assert watcher.interval == 100
+
+        watcher._adapt(changed=True)
+        assert watcher.interval == 30
+        assert 27 <= watcher.next_delay() <= 33
+
+    @patch("watch.httpx.Client")
+    def test_run_reports_errors_and_stops(self, mock_client):
+        """Test that request errors become events and max_polls ends the loop."""
+        client = Mock()
+        client.get.side_effect = httpx.ConnectError("offline")
+        mock_client.return_value.__enter__.return_value = client
+        events, sleeps = [], []
+
+        Watcher(cache=MemoryCache()).run(events.append, max_polls=2, sleep=sleeps.append)
+
+        assert events == [{"event": "error", "error": "offline"}] * 2
+        assert len(sleeps) == 1
+
+    def test_posts_without_id_are_skipped(self):
+        """Test that listing entries without an ID do not break the poll."""
+        client = Mock()
+        client.get.side_effect = [
+            listing_response([{"post_id": 1, "status": "Submitted"}]),
+            listing_response(
+                [{"status": "Submitted"}, "junk", {"post_id": 1, "status": "Submitted"}]
+            ),
+        ]
+        watcher = Watcher(summarise=False, cache=MemoryCache())
+
+        watcher.poll_once(client)
+
+        assert watcher.poll_once(client) == []
+        assert watcher.statuses == {"1": "Submitted"}
+
+    def test_failed_state_write_keeps_events_for_next_poll(self):
+        """Test that events are not lost when the watch state cannot be stored."""
+        cache = MemoryCache()
+        client = Mock()
+        client.get.side_effect = [
+            listing_response([{"post_id": 1, "status": "Submitted"}], etag='"e1"'),
+            listing_response([{"post_id": 2, "status": "Submitted"}], etag='"e2"'),
+            listing_response([{"post_id": 2, "status": "Submitted"}], etag='"e2"'),
+        ]
+        watcher = Watcher(summarise=False, cache=cache)
+        watcher.poll_once(client)
+
+        with patch.object(cache, "set_json", side_effect=ConnectionError("cache down")):
+            with pytest.raises(ConnectionError):
+                watcher.poll_once(client)
+
+        assert watcher.etag == '"e1"'
+        assert watcher.poll_once(client) == [{"event": "new", "ref": 2, "status": "Submitted"}]
+        assert client.get.call_args[1]["headers"]["If-None-Match"] == '"e1"'
+
+    @patch("watch.httpx.Client")
+    def test_run_survives_malformed_listing(self, mock_client):
+        """Test that non-HTTP errors are reported and backed off from, not raised."""
+        client = Mock()
+        response = listing_response([])
+        response.json.side_effect = ValueError("Expecting value")
+        client.get.return_value = response
+        mock_client.return_value.__enter__.return_value = client
+        events = []
+        watcher = Watcher(interval=60, min_interval=30, max_interval=600, cache=MemoryCache())
+
+        watcher.run(events.append, max_polls=2, sleep=lambda delay: None)
+
+        assert events == [{"event": "error", "error": "Expecting value"}] * 2
+        assert watcher.interval == 135
+
+    @patch("src.main.post_webhook")
+    @patch("src.main.Watcher")
+    def test_watch_command_posts_to_webhook(self, mock_watcher, mock_post):
+        """Test that the watch command delivers events to the webhook."""
+        mock_watcher.return_value.run.side_effect = lambda on_event, max_polls: on_event(
+            {"event": "new", "ref": 3}
+        )
+
+        result = CliRunner().invoke(
+            app, ["watch", "--webhook", "http://localhost:9000/hook", "--max-polls", "1"]
+        )
+
+        assert result.exit_code == 0
+        mock_post.assert_called_once_with("http://localhost:9000/hook", {"event": "new", "ref": 3})
+        assert result.stdout == ""